@@ -0,0 +1,108 @@
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, schemas, crud, search, catalog_cache, stock
+from .auth import get_password_hash_async
+
+# Async variants of crud for the routers. The query logic lives once, in crud;
+# run_sync() executes it on the async connection (aiosqlite / asyncpg), so the
+# event loop never blocks on I/O. Whatever a response schema reads must be loaded
+# before returning: lazy loads are not possible once we are back in async code.
+
+# User
+async def get_user_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalars().first()
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    hashed_password = await get_password_hash_async(user.password)
+    db_user = models.User(username=user.username, hashed_password=hashed_password, role=user.role)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def update_user(db: AsyncSession, user_id: int, user: schemas.UserUpdate):
+    return await db.run_sync(crud.update_user, user_id, user)
+
+# Category
+async def get_categories(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    return await db.run_sync(crud.get_categories, skip=skip, limit=limit, cursor=cursor)
+
+async def create_category(db: AsyncSession, category: schemas.CategoryCreate):
+    return await db.run_sync(crud.create_category, category)
+
+async def delete_category(db: AsyncSession, category_id: int):
+    return await db.run_sync(crud.delete_category, category_id)
+
+# Product
+def _create_product_loaded(db, product):
+    db_product = crud.create_product(db, product)
+    db_product.category  # load it now for the response
+    return db_product
+
+async def get_products(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    return await db.run_sync(crud.get_products, skip=skip, limit=limit, cursor=cursor)
+
+async def get_product_changes(db: AsyncSession, since: int = 0, limit: int = 1000, cursor: Optional[str] = None):
+    return await db.run_sync(crud.get_product_changes, since=since, limit=limit, cursor=cursor)
+
+async def search_products(db: AsyncSession, q: str, limit: int = 20):
+    return await db.run_sync(search.search_products, q, limit=limit)
+
+async def get_product_by_barcode(db: AsyncSession, barcode: str):
+    # Cache hits never touch the session at all
+    return catalog_cache.peek(barcode) or await db.run_sync(catalog_cache.get, barcode)
+
+async def get_low_stock_products(db: AsyncSession, threshold: Optional[int] = None, limit: int = 100):
+    return await db.run_sync(crud.get_low_stock_products, threshold=threshold, limit=limit)
+
+async def create_product(db: AsyncSession, product: schemas.ProductCreate):
+    return await db.run_sync(_create_product_loaded, product)
+
+async def delete_product(db: AsyncSession, product_id: int):
+    return await db.run_sync(crud.delete_product, product_id)
+
+# Transaction
+async def create_transaction(db: AsyncSession, transaction: schemas.TransactionCreate, cashier_id: int):
+    quantities = crud.cart_quantities(transaction)
+    transaction_id = await stock.run_with_retry_async(db, crud.checkout, quantities, cashier_id)
+    return await db.run_sync(crud.get_transaction, transaction_id)
+
+async def create_transactions_batch(db: AsyncSession, batch: schemas.TransactionBatch, cashier_id: int):
+    # One commit per sale: a rejected one does not hold back the rest of the batch
+    results = []
+    for sale in batch.transactions:
+        try:
+            quantities = crud.cart_quantities(sale)
+            transaction_id, created = await stock.run_with_retry_async(
+                db, crud.checkout_once, quantities, cashier_id, sale.idempotency_key, sale.created_at
+            )
+        except ValueError as e:
+            await db.rollback()
+            results.append(schemas.QueuedTransactionResult(
+                idempotency_key=sale.idempotency_key, status="rejected", error=str(e)
+            ))
+            continue
+        results.append(schemas.QueuedTransactionResult(
+            idempotency_key=sale.idempotency_key,
+            status="created" if created else "duplicate",
+            transaction_id=transaction_id,
+        ))
+    return results
+
+async def get_transactions(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    return await db.run_sync(crud.get_transactions, skip=skip, limit=limit, cursor=cursor)
+
+async def delete_transaction(db: AsyncSession, transaction_id: int):
+    return await db.run_sync(crud.delete_transaction, transaction_id)
+
+# Analytics
+async def get_sales_summary(db: AsyncSession, start=None, end=None):
+    return await db.run_sync(crud.get_sales_summary, start=start, end=end)
+
+async def get_revenue_timeseries(db: AsyncSession, bucket: str = "hour", start=None, end=None):
+    return await db.run_sync(crud.get_revenue_timeseries, bucket=bucket, start=start, end=end)
+
+async def get_category_sales(db: AsyncSession, start=None, end=None):
+    return await db.run_sync(crud.get_category_sales, start=start, end=end)
@@ -1,24 +1,52 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import schemas, database, models
 
 SECRET_KEY = "CHANGE_THIS_SECRET_KEY_FOR_PRODUCTION" # Use env var in real app
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Authenticated principals are cached per token subject so a request does not
+# need a users query. Entries expire after the TTL and are dropped right away
+# by invalidate_user() when a user's role or active flag changes.
+USER_CACHE_TTL_SECONDS = 60
+USER_CACHE_MAX_SIZE = 1024
+
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+# bcrypt is slow on purpose (~100-300 ms a call). It runs on its own small pool so
+# a burst of logins can neither stall the event loop nor eat the request threadpool.
+PASSWORD_HASH_WORKERS = int(os.getenv("SMARTPOS_PASSWORD_HASH_WORKERS", "2"))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _password_executor.submit(pwd_context.verify, plain_password, hashed_password).result()
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return _password_executor.submit(pwd_context.hash, password).result()
+
+async def verify_password_async(plain_password, hashed_password):
+    future = _password_executor.submit(pwd_context.verify, plain_password, hashed_password)
+    return await asyncio.wrap_future(future)
+
+async def get_password_hash_async(password):
+    return await asyncio.wrap_future(_password_executor.submit(pwd_context.hash, password))
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -30,7 +58,33 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+def _cached_user(username: str):
+    with _user_cache_lock:
+        entry = _user_cache.get(username)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del _user_cache[username]
+            return None
+        _user_cache.move_to_end(username)
+        return user
+
+def _cache_user(user: schemas.User):
+    with _user_cache_lock:
+        _user_cache[user.username] = (time.monotonic() + USER_CACHE_TTL_SECONDS, user)
+        _user_cache.move_to_end(user.username)
+        while len(_user_cache) > USER_CACHE_MAX_SIZE:
+            _user_cache.popitem(last=False)
+
+def invalidate_user(username: Optional[str] = None):
+    with _user_cache_lock:
+        if username is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(username, None)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -44,17 +98,24 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
-    if user is None:
+    user = _cached_user(token_data.username)
+    if user is not None:
+        return user
+    result = await db.execute(select(models.User).where(models.User.username == token_data.username))
+    db_user = result.scalars().first()
+    if db_user is None:
         raise credentials_exception
+    # Detached snapshot, safe to share between requests and sessions
+    user = schemas.User.from_orm(db_user)
+    _cache_user(user)
     return user
 
-def get_current_active_user(current_user: models.User = Depends(get_current_user)):
+async def get_current_active_user(current_user: schemas.User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-def get_admin_user(current_user: models.User = Depends(get_current_active_user)):
+async def get_admin_user(current_user: schemas.User = Depends(get_current_active_user)):
     if current_user.role != 'admin':
         raise HTTPException(status_code=403, detail="Not authorized")
     return current_user
@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+from typing import List
+from . import benchmark
+
+# Sync vs async database stack under --clients concurrent clients. Both apps
+# serve the same two endpoints (a product page and a checkout), one with def
+# endpoints on database.get_db + crud (FastAPI's threadpool, 40 threads), the
+# other with async def endpoints on get_async_db + async_crud. Every client keeps
+# sending requests for --seconds, one checkout for every four product pages. In
+# process, through httpx's ASGI transport on one event loop, so only the stack
+# differs. Requests still in flight at the end are waited for and counted.
+#   python -m backend.bench_async [--clients 500] [--seconds 20]
+
+def make_apps():
+    from fastapi import Depends, FastAPI, HTTPException
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import Session
+    from . import async_crud, auth, crud, database, schemas
+
+    sync_app, async_app = FastAPI(), FastAPI()
+
+    @sync_app.get("/products/", response_model=List[schemas.Product])
+    def read_products_sync(limit: int = 20, db: Session = Depends(database.get_db)):
+        return crud.get_products(db, limit=limit)
+
+    @sync_app.post("/transactions/", response_model=schemas.Transaction)
+    def create_transaction_sync(
+        transaction: schemas.TransactionCreate,
+        db: Session = Depends(database.get_db),
+        current_user: schemas.User = Depends(auth.get_current_active_user)
+    ):
+        try:
+            return crud.create_transaction(db, transaction, current_user.id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @async_app.get("/products/", response_model=List[schemas.Product])
+    async def read_products_async(limit: int = 20, db: AsyncSession = Depends(database.get_async_db)):
+        return await async_crud.get_products(db, limit=limit)
+
+    @async_app.post("/transactions/", response_model=schemas.Transaction)
+    async def create_transaction_async(
+        transaction: schemas.TransactionCreate,
+        db: AsyncSession = Depends(database.get_async_db),
+        current_user: schemas.User = Depends(auth.get_current_active_user)
+    ):
+        try:
+            return await async_crud.create_transaction(db, transaction, current_user.id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return {"sync": sync_app, "async": async_app}
+
+async def _run(clients: int, seconds: float):
+    import httpx
+    from . import auth
+
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'admin'})}"}
+    print(f"{clients} clients for {seconds:.0f}s")
+    print(f"{'stack':>6} {'req/s':>7} {'errors':>6}  latency")
+    for name, app in make_apps().items():
+        samples, errors = [], []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def register(n):
+                i = 0
+                while not done.is_set():
+                    i += 1
+                    try:
+                        with benchmark.stopwatch() as elapsed:
+                            if (n + i) % 5 == 0:
+                                sale = {"items": [{"product_id": 1 + n % 20, "quantity": 1}]}
+                                response = await client.post("/transactions/", json=sale, headers=headers)
+                            else:
+                                response = await client.get("/products/", headers=headers)
+                    except Exception as e:
+                        # e.g. the pool's TimeoutError, raised straight through the ASGI transport
+                        errors.append(type(e).__name__)
+                        continue
+                    if response.status_code == 200:
+                        samples.append(elapsed[0])
+                    else:
+                        errors.append(response.status_code)
+
+            await client.get("/products/")  # warm up
+            done = asyncio.Event()
+            asyncio.get_running_loop().call_later(seconds, done.set)
+            with benchmark.stopwatch() as total:
+                await asyncio.gather(*(register(n) for n in range(clients)))
+        print(f"{name:>6} {len(samples) / total[0]:>7,.0f} {len(errors):>6}  {benchmark.latency_summary(samples)}")
+        if errors:
+            print(f"        errors: {sorted(set(map(str, errors)))}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync vs async database stack under many concurrent clients")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    benchmark.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    benchmark.use_scratch_database(args.database_url)
+    benchmark.setup(skus=20)
+    from sqlalchemy import update
+    from . import models
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        db.execute(update(models.Product).values(stock=10 ** 9))
+        db.commit()
+    finally:
+        db.close()
+    asyncio.run(_run(args.clients, args.seconds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import asyncio
+from . import benchmark
+
+# Per-request cost of authentication, with and without the principal cache in
+# auth.get_current_user: first the dependency on its own, then a whole
+# GET /auth/me through the ASGI app (in process, no network).
+#   python -m backend.bench_auth [--requests 2000]
+
+async def _run(requests: int):
+    import httpx
+    from . import auth
+    from .database import AsyncSessionLocal, async_engine
+    from .main import app
+
+    token = auth.create_access_token({"sub": "admin"})
+
+    async def dependency():
+        async with AsyncSessionLocal() as db:
+            await auth.get_current_user(token, db)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {"Authorization": f"Bearer {token}"}
+
+        async def whole_request():
+            response = await client.get("/auth/me", headers=headers)
+            response.raise_for_status()
+
+        print(f"{'':22} {'cache':>6} {'per call':>10} {'queries/call':>13}")
+        for label, call in (("get_current_user", dependency), ("GET /auth/me", whole_request)):
+            for cached in (False, True):
+                await call()  # warm up the pool (and the cache)
+                with benchmark.count_queries(async_engine.sync_engine) as queries, benchmark.stopwatch() as total:
+                    for _ in range(requests):
+                        if not cached:
+                            auth.invalidate_user()
+                        await call()
+                print(f"{label:22} {'on' if cached else 'off':>6} "
+                      f"{total[0] / requests * 1e6:>8,.0f} us {queries[0] / requests:>13.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Authentication overhead per request, with and without the cache")
+    parser.add_argument("--requests", type=int, default=2000)
+    benchmark.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    benchmark.use_scratch_database(args.database_url)
+    benchmark.setup()
+    asyncio.run(_run(args.requests))
+
+if __name__ == "__main__":
+    main()
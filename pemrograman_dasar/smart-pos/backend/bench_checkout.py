@@ -0,0 +1,54 @@
+import argparse
+import random
+from . import benchmark
+
+# Checkout throughput (sales per second, one register) for carts of 1, 10 and 50
+# lines, through crud.create_transaction: one batched product query, one
+# conditional stock UPDATE and one commit per sale.
+#   python -m backend.bench_checkout [--sales 500] [--lines 1,10,50]
+
+def run(sales: int, cart_sizes):
+    from sqlalchemy import update
+    from . import crud, models, schemas
+    from .database import SessionLocal, engine
+
+    db = SessionLocal()
+    try:
+        db.execute(update(models.Product).values(stock=10 ** 9))
+        db.commit()
+        product_ids = [product_id for (product_id,) in db.query(models.Product.id)]
+        cashier_id = crud.get_user_by_username(db, "admin").id
+        rng = random.Random(1)
+        print(f"{'lines':>5} {'sales/s':>9} {'queries/sale':>13}  latency")
+        for lines in cart_sizes:
+            carts = [
+                schemas.TransactionCreate(items=[
+                    {"product_id": product_id, "quantity": rng.randint(1, 3)}
+                    for product_id in rng.sample(product_ids, lines)
+                ])
+                for _ in range(sales)
+            ]
+            samples = []
+            with benchmark.count_queries(engine) as queries, benchmark.stopwatch() as total:
+                for cart in carts:
+                    with benchmark.stopwatch() as elapsed:
+                        crud.create_transaction(db, cart, cashier_id)
+                    samples.append(elapsed[0])
+            # create_transaction also reloads the sale for the response
+            print(f"{lines:>5} {sales / total[0]:>9,.0f} {queries[0] / sales:>13.1f}  {benchmark.latency_summary(samples)}")
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checkout throughput by cart size")
+    parser.add_argument("--sales", type=int, default=500, help="sales per cart size")
+    parser.add_argument("--lines", default="1,10,50", help="comma-separated cart sizes (distinct products per sale)")
+    benchmark.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    cart_sizes = [int(lines) for lines in args.lines.split(",")]
+    benchmark.use_scratch_database(args.database_url)
+    benchmark.setup(skus=max(cart_sizes) * 4)
+    run(args.sales, cart_sizes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tracemalloc
+from . import benchmark
+
+# Memory and speed of GET /transactions/export (bulk.export_transactions) over a
+# growing share of the history. The history is seeded by seed_data in a child
+# process. The Python heap peak of each export (tracemalloc) should stay flat
+# from the smallest range to the whole table. Peak RSS also counts SQLite's page
+# cache and memory-mapped file, which grow with the file up to the profile's
+# cache_size + mmap_size. The request asked for 10M line items: pass
+# --items 10000000 (seeding takes a while).
+#   python -m backend.bench_export [--items 1000000] [--formats csv,ndjson,parquet]
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+async def _export(start, end, fmt):
+    from . import bulk
+    size = 0
+    async for chunk in bulk.export_transactions(start, end, fmt):
+        size += len(chunk)
+    return size
+
+def run(formats):
+    from sqlalchemy import func
+    from . import bulk, models
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        first, last = db.query(func.min(models.Transaction.created_at), func.max(models.Transaction.created_at)).one()
+        items = db.query(models.TransactionItem).count()
+    finally:
+        db.close()
+    if first is None:
+        raise SystemExit("No transactions to export")
+    print(f"{items:,} line items, peak RSS before exporting {peak_rss_mb() or 0:.0f} MB")
+    print(f"{'format':>7} {'range':>6} {'MB out':>8} {'rows/s':>9} {'heap peak':>10} {'peak RSS':>9}")
+    tracemalloc.start()
+    for fmt in formats:
+        if fmt == "parquet" and not bulk.parquet_available():
+            print(f"{fmt:>7}  skipped, pyarrow is not installed")
+            continue
+        for share in (0.01, 0.1, 1.0):
+            end = None if share == 1.0 else first + (last - first) * share
+            tracemalloc.reset_peak()
+            with benchmark.stopwatch() as elapsed:
+                size = asyncio.run(_export(None, end, fmt))
+            heap, rss = tracemalloc.get_traced_memory()[1], peak_rss_mb()
+            print(f"{fmt:>7} {share:>6.0%} {size / 2 ** 20:>8,.1f} {items * share / elapsed[0]:>9,.0f} "
+                  f"{heap / 2 ** 20:>7,.1f} MB {f'{rss:.0f} MB' if rss else 'n/a':>9}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming transaction export: memory and throughput")
+    parser.add_argument("--items", type=int, default=1000000, help="line items to seed (about 2.5 per transaction)")
+    parser.add_argument("--formats", default="csv,ndjson,parquet")
+    benchmark.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    url = benchmark.use_scratch_database(args.database_url)
+    benchmark.setup()
+    seed = [sys.executable, "-m", "backend.seed_data", "--transactions", str(int(args.items / 2.5)),
+            "--days", "365", "--skus", "500", "--seed", "1"]
+    subprocess.run(seed, check=True, env=dict(os.environ, SMARTPOS_DATABASE_URL=url),
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    run(args.formats.split(","))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import contextlib
+import io
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+from . import benchmark
+
+# The frontend's HTTP client: utils.get_http_session() (one pooled keep-alive
+# Session, gzip) against what it replaced, a module-level requests.get/post per
+# call (a throwaway Session and a new TCP connection each time). The API runs in
+# a child process on a seeded scratch database, at utils.API_URL (the address
+# the pages use, so that port has to be free). First --calls raw GETs per
+# endpoint and the bytes on the wire, then full page runs through Streamlit's
+# AppTest (median of --renders, after two warm-ups). The frontend response
+# cache is switched off so every rerun really goes over HTTP.
+#   python -m backend.bench_frontend [--transactions 2000] [--calls 200] [--renders 10]
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRONTEND = os.path.join(PROJECT_ROOT, "frontend")
+ENDPOINTS = ["/products/low-stock", "/analytics/summary", "/products/", "/transactions/"]
+PAGES = ["1_Admin_Dashboard.py", "3_Inventory.py", "4_Transactions.py"]
+
+def start_api(api_url, database_url):
+    address = urlsplit(api_url)
+    with socket.socket() as sock:
+        if sock.connect_ex((address.hostname, address.port)) == 0:
+            raise SystemExit(f"Something is already listening on {api_url}; stop it first")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", address.hostname,
+         "--port", str(address.port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=dict(os.environ, SMARTPOS_DATABASE_URL=database_url),
+    )
+    for _ in range(300):
+        with socket.socket() as sock:
+            if sock.connect_ex((address.hostname, address.port)) == 0:
+                return server
+        if server.poll() is not None:
+            raise SystemExit("The API did not start")
+        time.sleep(0.1)
+    server.terminate()
+    raise SystemExit("The API did not start within 30 s")
+
+def raw_calls(utils, headers, calls: int):
+    import requests
+    session = utils.get_http_session()
+    print(f"{'endpoint':<22} {'per call':>9} {'pooled':>9}  body / on the wire")
+    for path in ENDPOINTS:
+        url = utils.API_URL + path
+        per_request = []
+        for client in (requests, session):
+            client.get(url, headers=headers, timeout=utils.REQUEST_TIMEOUT)
+            with benchmark.stopwatch() as elapsed:
+                for _ in range(calls):
+                    client.get(url, headers=headers, timeout=utils.REQUEST_TIMEOUT)
+            per_request.append(elapsed[0] / calls)
+        plain = requests.get(url, headers={**headers, "Accept-Encoding": "identity"}, timeout=utils.REQUEST_TIMEOUT)
+        packed = session.get(url, headers=headers, stream=True, timeout=utils.REQUEST_TIMEOUT)
+        wire = len(packed.raw.read(decode_content=False))
+        print(f"{path:<22} {per_request[0] * 1000:>6.2f} ms {per_request[1] * 1000:>6.2f} ms  "
+              f"{len(plain.content):,} B / {wire:,} B ({packed.headers.get('content-encoding') or 'identity'})")
+
+def page_renders(utils, token, renders: int):
+    import requests
+    from streamlit.testing.v1 import AppTest
+    pooled = utils.get_http_session
+    clients = {"pooled": pooled, "per call": lambda: requests}
+
+    def render(page):
+        app = AppTest.from_file(os.path.join(FRONTEND, "app.py"), default_timeout=60)
+        app.session_state["token"] = token
+        app.session_state["role"] = "admin"
+        app.session_state["username"] = "admin"
+        app.session_state["logged_in"] = True
+        with contextlib.redirect_stdout(io.StringIO()):  # app.py reports where it found the backend
+            app.run()
+            app.switch_page(f"pages/{page}")
+            with benchmark.stopwatch() as elapsed:
+                app.run()
+        if app.exception:
+            raise SystemExit(f"{page}: {app.exception[0].value}")
+        return elapsed[0]
+
+    print(f"{'page':<24} {'per call':>9} {'pooled':>9}  (median of {renders} reruns)")
+    try:
+        for page in PAGES:
+            samples = {name: [] for name in clients}
+            for i in range(renders + 2):
+                # Alternate the clients so drift on the machine hits both alike
+                for name, client in clients.items():
+                    utils.get_http_session = client
+                    elapsed = render(page)
+                    if i >= 2:
+                        samples[name].append(elapsed)
+            print(f"{page:<24} {statistics.median(samples['per call']) * 1000:>6.0f} ms "
+                  f"{statistics.median(samples['pooled']) * 1000:>6.0f} ms")
+    finally:
+        utils.get_http_session = pooled
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Frontend HTTP client: pooled keep-alive session vs a request per call")
+    parser.add_argument("--transactions", type=int, default=2000, help="sales to seed")
+    parser.add_argument("--calls", type=int, default=200, help="raw GETs per endpoint and client")
+    parser.add_argument("--renders", type=int, default=10, help="measured page runs per page and client")
+    args = parser.parse_args(argv)
+    url = benchmark.use_scratch_database()
+    benchmark.setup(seed_transactions=args.transactions, seed=1)
+
+    from . import auth
+    sys.path.insert(0, FRONTEND)  # the pages import it as plain `utils`
+    import utils
+    utils._cache_rule = lambda endpoint: None  # measure the client, not the response cache
+    token = auth.create_access_token({"sub": "admin"})
+
+    server = start_api(utils.API_URL, url)
+    try:
+        raw_calls(utils, {"Authorization": f"Bearer {token}"}, args.calls)
+        page_renders(utils, token, args.renders)
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
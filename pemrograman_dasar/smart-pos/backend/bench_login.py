@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+from . import benchmark
+
+# Checkout latency while a shift change logs everyone in at once. --registers
+# clients keep posting sales for --seconds; halfway through, --logins POST
+# /auth/token arrive together. Runs the app in process on one event loop, like a
+# single uvicorn worker. --inline verifies the password on the event loop instead
+# of the bcrypt pool, to show what the burst used to cost.
+#   python -m backend.bench_login [--registers 8] [--logins 40] [--seconds 6] [--inline]
+
+async def _run(registers: int, logins: int, seconds: float, inline: bool):
+    import httpx
+    from . import auth
+    from .bootstrap import ADMIN_PASSWORD, ADMIN_USERNAME
+    from .main import app
+
+    if inline:
+        async def verify_on_loop(plain_password, hashed_password):
+            return auth.pwd_context.verify(plain_password, hashed_password)
+        auth.verify_password_async = verify_on_loop
+
+    token = auth.create_access_token({"sub": ADMIN_USERNAME})
+    headers = {"Authorization": f"Bearer {token}"}
+    sale = {"items": [{"product_id": 1, "quantity": 1}]}
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    burst_at = started + seconds / 2
+    quiet, during = [], []
+    burst_window = [burst_at, burst_at]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def register():
+            while loop.time() - started < seconds:
+                sent = loop.time()
+                response = await client.post("/transactions/", json=sale, headers=headers)
+                response.raise_for_status()
+                done = loop.time()
+                (during if sent < burst_window[1] and done > burst_window[0] else quiet).append(done - sent)
+
+        async def login():
+            response = await client.post("/auth/token", data={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+            response.raise_for_status()
+            return loop.time()
+
+        async def shift_change():
+            await asyncio.sleep(burst_at - loop.time())
+            burst_window[1] = float("inf")
+            finished = await asyncio.gather(*(login() for _ in range(logins)))
+            burst_window[1] = max(finished)
+
+        await asyncio.gather(shift_change(), *(register() for _ in range(registers)))
+
+    mode = "on the event loop" if inline else f"on {auth.PASSWORD_HASH_WORKERS} bcrypt worker(s)"
+    print(f"{logins} logins verified {mode}, burst took {burst_window[1] - burst_window[0]:.2f}s")
+    print(f"checkouts outside the burst ({len(quiet)}): {benchmark.latency_summary(quiet)}")
+    print(f"checkouts during the burst  ({len(during)}): {benchmark.latency_summary(during)}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checkout latency during a burst of logins")
+    parser.add_argument("--registers", type=int, default=8, help="concurrent clients posting sales")
+    parser.add_argument("--logins", type=int, default=40, help="simultaneous logins in the burst")
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument("--inline", action="store_true", help="verify passwords on the event loop (the old behaviour)")
+    benchmark.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    benchmark.use_scratch_database(args.database_url)
+    benchmark.setup(skus=10)
+    from sqlalchemy import update
+    from . import models
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        db.execute(update(models.Product).values(stock=10 ** 9))
+        db.commit()
+    finally:
+        db.close()
+    asyncio.run(_run(args.registers, args.logins, args.seconds, args.inline))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+from . import benchmark
+
+# Latency of one GET /transactions/ page (crud.get_transactions) at increasing
+# depth into the history, paged by OFFSET and by cursor. The cursor page should
+# cost the same at every depth; the offset page grows with it. The request asked
+# for 5M transactions: pass --transactions 5000000 (seeding takes a while).
+#   python -m backend.bench_pagination [--transactions 500000] [--limit 100]
+
+DEPTHS = (0, 0.01, 0.1, 0.5, 0.9, 0.99)
+
+def run(limit: int, repeats: int):
+    from . import crud, models, pagination
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        total = db.query(models.Transaction).count()
+        newest_first = db.query(models.Transaction.created_at, models.Transaction.id).order_by(
+            models.Transaction.created_at.desc(), models.Transaction.id.desc()
+        )
+        print(f"{total:,} transactions, {limit} per page, best of {repeats}")
+        print(f"{'depth':>12} {'offset':>10} {'cursor':>10}")
+        results = []
+        for fraction in DEPTHS:
+            depth = min(int(total * fraction), max(total - limit, 0))
+            # The cursor a client would hold after paging down to this depth
+            cursor = pagination.encode_cursor(*newest_first.offset(depth - 1).first()) if depth else None
+            timings = []
+            for page in (lambda: crud.get_transactions(db, skip=depth, limit=limit),
+                         lambda: crud.get_transactions(db, limit=limit, cursor=cursor)):
+                samples = []
+                for _ in range(repeats):
+                    db.expunge_all()
+                    with benchmark.stopwatch() as elapsed:
+                        rows = page()
+                    samples.append(elapsed[0])
+                timings.append(min(samples))
+            results.append(timings)
+            print(f"{depth:>12,} {timings[0] * 1000:>7.1f} ms {timings[1] * 1000:>7.1f} ms")
+        first, deepest = results[0][1], results[-1][1]
+        print(f"cursor page at the deepest point costs {deepest / first:.1f}x the first page "
+              f"(offset: {results[-1][0] / results[0][0]:.1f}x)")
+        return rows
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offset vs cursor page latency by depth")
+    parser.add_argument("--transactions", type=int, default=500000, help="transactions to seed")
+    parser.add_argument("--limit", type=int, default=100, help="page size")
+    parser.add_argument("--repeats", type=int, default=5)
+    benchmark.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    benchmark.use_scratch_database(args.database_url)
+    benchmark.setup(seed_transactions=args.transactions, seed=1)
+    run(args.limit, args.repeats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import threading
+from . import benchmark
+
+# Connection pool saturation: --clients threads check out sales back to back for
+# --seconds each, with more and more clients than the pool has connections
+# (SMARTPOS_DB_POOL_SIZE + SMARTPOS_DB_MAX_OVERFLOW on server databases). Past
+# that point throughput should level off and the extra clients wait for a
+# connection, rather than failing.
+#   SMARTPOS_DB_POOL_SIZE=5 SMARTPOS_DB_MAX_OVERFLOW=5 python -m backend.bench_pool \
+#       --database-url postgresql+psycopg2://postgres@localhost/smartpos_bench [--clients 5,10,20,40,80]
+
+def run(client_counts, seconds: float):
+    from sqlalchemy import update
+    from . import crud, models
+    from .database import SessionLocal, engine
+
+    db = SessionLocal()
+    try:
+        db.execute(update(models.Product).values(stock=10 ** 9))
+        db.commit()
+        product_ids = [product_id for (product_id,) in db.query(models.Product.id)]
+        cashier_id = crud.get_user_by_username(db, "admin").id
+    finally:
+        db.close()
+
+    print(f"pool: {engine.pool.status()}")
+    print(f"{'clients':>7} {'sales/s':>8} {'errors':>6}  {'waiting for a connection':<40}  sale latency")
+    for clients in client_counts:
+        stop = threading.Event()
+        lock = threading.Lock()
+        waits, samples, errors = [], [], []
+
+        def client(n):
+            quantities = {product_ids[n % len(product_ids)]: 1}
+            while not stop.is_set():
+                session = SessionLocal()
+                try:
+                    with benchmark.stopwatch() as elapsed:
+                        with benchmark.stopwatch() as waited:
+                            session.connection()
+                        crud.checkout(session, quantities, cashier_id)
+                    with lock:
+                        waits.append(waited[0])
+                        samples.append(elapsed[0])
+                except Exception as e:
+                    with lock:
+                        errors.append(type(e).__name__)
+                finally:
+                    session.close()
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+        for thread in threads:
+            thread.start()
+        stop.wait(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        print(f"{clients:>7} {len(samples) / seconds:>8,.0f} {len(errors):>6}  "
+              f"{benchmark.latency_summary(waits):<40}  {benchmark.latency_summary(samples)}")
+        if errors:
+            print(f"        errors: {sorted(set(errors))}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checkout throughput as clients outnumber pooled connections")
+    parser.add_argument("--clients", default="5,10,20,40,80", help="comma-separated client counts")
+    parser.add_argument("--seconds", type=float, default=5.0, help="run time per client count")
+    benchmark.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    benchmark.use_scratch_database(args.database_url)
+    benchmark.setup(skus=20)
+    run([int(clients) for clients in args.clients.split(",")], args.seconds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+from . import benchmark
+
+# Queries per GET /transactions/ page, as the page grows. The eager-loaded listing
+# (crud.get_transactions) must stay at a fixed count; the lazy one shows the N+1
+# it replaced.
+#   python -m backend.bench_queries [--sizes 10,100,1000,10000]
+
+def run(sizes):
+    from . import crud, models, schemas
+    from .database import SessionLocal, engine
+
+    def listed(db, limit):
+        return crud.get_transactions(db, limit=limit)
+
+    def lazy(db, limit):
+        return db.query(models.Transaction).order_by(models.Transaction.created_at.desc()).limit(limit).all()
+
+    print(f"{'rows':>7} {'eager queries':>14} {'lazy queries':>13}")
+    counts = {}
+    for size in sizes:
+        row = []
+        for load in (listed, lazy):
+            db = SessionLocal()
+            try:
+                with benchmark.count_queries(engine) as queries:
+                    # Serialising walks items -> product -> category and cashier, like the response does
+                    page = [schemas.Transaction.from_orm(t) for t in load(db, size)]
+                row.append(queries[0])
+            finally:
+                db.close()
+        counts[size] = row[0]
+        print(f"{len(page):>7} {row[0]:>14} {row[1]:>13}")
+    if len(set(counts.values())) != 1:
+        raise SystemExit(f"Eager listing query count changes with page size: {counts}")
+    print(f"OK: {next(iter(counts.values()))} queries per page at every size")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query count of the transaction listing per page size")
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="comma-separated page sizes")
+    benchmark.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    benchmark.use_scratch_database(args.database_url)
+    benchmark.setup(seed_transactions=max(sizes), seed=1)
+    run(sizes)
+
+if __name__ == "__main__":
+    main()
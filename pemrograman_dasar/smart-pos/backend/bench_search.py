@@ -0,0 +1,79 @@
+import argparse
+import random
+from . import benchmark
+
+# Latency of /products/search (search.search_products) while a cashier types,
+# over a catalog of --products generated names, on the FTS5 index and on the
+# LIKE scan that databases without it fall back to.
+#   python -m backend.bench_search [--products 500000] [--repeats 20]
+
+BRANDS = ["Indomie", "Kapal Api", "Aqua", "Chitato", "Oreo", "Teh Pucuk", "Good Day", "Sari Roti",
+          "Ultra Milk", "Pocari", "Sedaap", "Lifebuoy", "Pepsodent", "Rinso", "Faber Castell", "Joyko"]
+KINDS = ["Goreng", "Kuah Soto", "Kopi Susu", "Air Mineral", "Keripik", "Biskuit", "Teh Melati", "Roti Tawar",
+         "Susu Coklat", "Minuman Isotonik", "Sabun Cair", "Pasta Gigi", "Deterjen", "Pensil 2B", "Penghapus"]
+SIZES = ["50g", "100g", "250ml", "600ml", "1L", "1kg", "Sachet", "Renteng", "Pack", "Box"]
+
+# What the search box holds after each keystroke
+TYPED = ["i", "in", "ind", "indo", "indomie g", "kop", "kopi su", "sab", "ultra milk co", "8991", "89912345"]
+
+def seed_catalog(products: int):
+    from sqlalchemy import insert
+    from . import models, table_versions
+    from .database import SessionLocal
+
+    rng = random.Random(1)
+    db = SessionLocal()
+    try:
+        for start in range(0, products, 10000):
+            db.execute(insert(models.Product.__table__), [
+                {"name": f"{rng.choice(BRANDS)} {rng.choice(KINDS)} {rng.choice(SIZES)}",
+                 "barcode": f"899{i:010d}", "price": rng.randrange(500, 100000, 500),
+                 "stock": rng.randrange(0, 300), "category_id": 1}
+                for i in range(start, min(start + 10000, products))
+            ])
+        table_versions.stamp_products(db, models.Product.id > 0)
+        db.commit()
+    finally:
+        db.close()
+
+def run(repeats: int):
+    from . import models, search
+    from .database import SessionLocal
+
+    fts_available = search.fts_available
+    db = SessionLocal()
+    try:
+        print(f"{db.query(models.Product).count():,} products, best of {repeats}")
+        modes = [("fts5", True), ("like", False)] if fts_available(db) else [("like", False)]
+        print(f"{'query':>15} " + " ".join(f"{name:>10} {'hits':>5}" for name, _ in modes))
+        for q in TYPED:
+            cells = []
+            for name, use_fts in modes:
+                search.fts_available = lambda db: use_fts
+                try:
+                    samples = []
+                    for _ in range(repeats):
+                        db.expunge_all()
+                        with benchmark.stopwatch() as elapsed:
+                            hits = search.search_products(db, q)
+                        samples.append(elapsed[0])
+                finally:
+                    search.fts_available = fts_available
+                cells.append(f"{min(samples) * 1000:>7.2f} ms {len(hits):>5}")
+            print(f"{q!r:>15} " + " ".join(cells))
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Product search latency over a large catalog")
+    parser.add_argument("--products", type=int, default=500000, help="catalog size")
+    parser.add_argument("--repeats", type=int, default=20)
+    benchmark.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    benchmark.use_scratch_database(args.database_url)
+    benchmark.setup(skus=1)
+    seed_catalog(args.products)
+    run(args.repeats)
+
+if __name__ == "__main__":
+    main()
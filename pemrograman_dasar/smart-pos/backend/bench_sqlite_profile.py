@@ -0,0 +1,96 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+from . import benchmark
+
+# Checkout throughput on SQLite while dashboards read, under each
+# SMARTPOS_SQLITE_PROFILE. --writers threads check out sales and --readers threads
+# list the latest transactions for --seconds. The profile is read when
+# backend.database is imported (and WAL sticks to the file), so every profile
+# runs in its own process on its own fresh database file.
+#   python -m backend.bench_sqlite_profile [--profiles default,production] [--writers 4] [--readers 4]
+
+def run(writers: int, readers: int, seconds: float):
+    from . import crud, schemas
+    from .database import SessionLocal, sqlite_pragmas
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    sales, reads, errors, samples = [0], [0], [], []
+    cart = schemas.TransactionCreate(items=[{"product_id": 1, "quantity": 1}, {"product_id": 2, "quantity": 2}])
+
+    def loop(work, counter, timed):
+        db = SessionLocal()
+        try:
+            while not stop.is_set():
+                try:
+                    with benchmark.stopwatch() as elapsed:
+                        work(db)
+                except Exception as e:
+                    db.rollback()
+                    with lock:
+                        errors.append(type(e).__name__)
+                    continue
+                with lock:
+                    counter[0] += 1
+                    if timed:
+                        samples.append(elapsed[0])
+        finally:
+            db.close()
+
+    def checkout(db):
+        crud.create_transaction(db, cart, 1)
+
+    def dashboard(db):
+        db.expunge_all()
+        crud.get_transactions(db, limit=100)
+
+    threads = [threading.Thread(target=loop, args=(checkout, sales, True)) for _ in range(writers)]
+    threads += [threading.Thread(target=loop, args=(dashboard, reads, False)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    stop.wait(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    print(f"pragmas: {sqlite_pragmas() or 'SQLite defaults'}")
+    print(f"{sales[0] / seconds:,.0f} checkouts/s ({benchmark.latency_summary(samples)}), "
+          f"{reads[0] / seconds:,.0f} dashboard reads/s, {len(errors)} errors {sorted(set(errors))}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mixed read/write checkout throughput per SQLite profile")
+    parser.add_argument("--profiles", default="default,production", help="comma-separated SMARTPOS_SQLITE_PROFILE values")
+    parser.add_argument("--writers", type=int, default=4, help="threads checking out sales")
+    parser.add_argument("--readers", type=int, default=4, help="threads reading the transaction list")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--transactions", type=int, default=20000, help="history to seed before measuring")
+    parser.add_argument("--profile", help=argparse.SUPPRESS)  # set when running one profile in a child process
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        benchmark.use_scratch_database()
+        benchmark.setup(seed_transactions=args.transactions, seed=1)
+        from sqlalchemy import update
+        from . import models
+        from .database import SessionLocal
+        db = SessionLocal()
+        try:
+            db.execute(update(models.Product).values(stock=10 ** 9))
+            db.commit()
+        finally:
+            db.close()
+        run(args.writers, args.readers, args.seconds)
+        return
+
+    for profile in args.profiles.split(","):
+        print(f"== {profile}", flush=True)
+        env = dict(os.environ, SMARTPOS_SQLITE_PROFILE=profile)
+        child = [sys.executable, "-m", "backend.bench_sqlite_profile", "--profile", profile,
+                 "--writers", str(args.writers), "--readers", str(args.readers),
+                 "--seconds", str(args.seconds), "--transactions", str(args.transactions)]
+        subprocess.run(child, env=env, check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import threading
+from . import benchmark
+
+# Stress test of the stock reservation engine: --threads cashiers start at once and
+# each takes one unit of the same SKU, which only has --stock in stock. Every fourth
+# one goes through crud.update_product_stock, the rest check out a sale. Passes if
+# exactly --stock of them succeed, the rest are refused with InsufficientStock, and
+# the final stock plus the units taken adds up to what was there (no oversell, no
+# lost update). Exits non-zero otherwise.
+#   python -m backend.bench_stock [--threads 300] [--stock 100]
+
+def run(threads: int, initial_stock: int):
+    from sqlalchemy import func
+    from . import crud, models, schemas, stock
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        product = crud.create_product(db, schemas.ProductCreate(
+            name="Stress SKU", barcode="STRESS-0001", price=1000, stock=initial_stock, category_id=1
+        ))
+        product_id, cashier_id = product.id, crud.get_user_by_username(db, "admin").id
+    finally:
+        db.close()
+
+    cart = schemas.TransactionCreate(items=[{"product_id": product_id, "quantity": 1}])
+    start = threading.Barrier(threads)
+    lock = threading.Lock()
+    sold, adjusted, refused, errors, samples = [0], [0], [0], [], []
+
+    def cashier(n):
+        session = SessionLocal()
+        try:
+            start.wait()
+            with benchmark.stopwatch() as elapsed:
+                try:
+                    if n % 4 == 3:
+                        crud.update_product_stock(session, product_id, 1)
+                        outcome = adjusted
+                    else:
+                        crud.create_transaction(session, cart, cashier_id)
+                        outcome = sold
+                except stock.InsufficientStock:
+                    outcome = refused
+            with lock:
+                outcome[0] += 1
+                samples.append(elapsed[0])
+        except Exception as e:
+            with lock:
+                errors.append(repr(e)[:200])
+        finally:
+            session.close()
+
+    workers = [threading.Thread(target=cashier, args=(n,)) for n in range(threads)]
+    with benchmark.stopwatch() as total:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    db = SessionLocal()
+    try:
+        final_stock = db.query(models.Product.stock).filter(models.Product.id == product_id).scalar()
+        units_sold = db.query(func.coalesce(func.sum(models.TransactionItem.quantity), 0)).filter(
+            models.TransactionItem.product_id == product_id
+        ).scalar()
+    finally:
+        db.close()
+
+    taken = sold[0] + adjusted[0]
+    print(f"{threads} cashiers, {initial_stock} in stock: {sold[0]} sold, {adjusted[0]} stock updates, "
+          f"{refused[0]} refused, {len(errors)} errors in {total[0]:.2f}s")
+    print(f"latency: {benchmark.latency_summary(samples)}")
+    print(f"final stock {final_stock}, units in recorded sales {units_sold}")
+    problems = []
+    if errors:
+        problems.append(f"errors: {errors[:3]}")
+    if taken != min(threads, initial_stock):
+        problems.append(f"expected {min(threads, initial_stock)} to succeed, got {taken}")
+    if final_stock < 0 or taken > initial_stock:
+        problems.append("oversold")
+    if final_stock + taken != initial_stock or units_sold != sold[0]:
+        problems.append("lost update: stock and recorded sales disagree")
+    if problems:
+        raise SystemExit("FAILED: " + "; ".join(problems))
+    print("OK: no oversell, no lost update")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent checkouts against one SKU")
+    parser.add_argument("--threads", type=int, default=300, help="simultaneous cashiers")
+    parser.add_argument("--stock", type=int, default=100, help="units of the SKU in stock")
+    benchmark.add_database_argument(parser)
+    args = parser.parse_args(argv)
+    benchmark.use_scratch_database(args.database_url)
+    benchmark.setup(skus=10)
+    run(args.threads, args.stock)
+
+if __name__ == "__main__":
+    main()
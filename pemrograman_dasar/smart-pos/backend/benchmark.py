@@ -0,0 +1,65 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Shared bits of the python -m backend.bench_* scripts. They run against a scratch
+# database: a fresh SQLite file unless --database-url names another one, which must
+# be a throwaway database too (the benchmarks seed and write into it). The engines
+# in backend.database are built from the environment at import time, so
+# use_scratch_database() has to run before anything imports it.
+
+def add_database_argument(parser):
+    parser.add_argument("--database-url", default=None,
+                        help="scratch database to use (default: a new SQLite file in a temp directory)")
+
+def use_scratch_database(url=None) -> str:
+    if url is None:
+        url = f"sqlite:///{tempfile.mkdtemp(prefix='smartpos-bench-')}/bench.db"
+    os.environ["SMARTPOS_DATABASE_URL"] = url
+    for name in ("SMARTPOS_ASYNC_DATABASE_URL", "SMARTPOS_REPLICA_URLS"):
+        os.environ.pop(name, None)
+    print(f"Scratch database: {url}")
+    return url
+
+def setup(seed_transactions: int = 0, **seed_options):
+    """Migrate the scratch database, create the admin user and optionally seed it."""
+    from . import bootstrap
+    bootstrap.bootstrap()
+    if seed_transactions or seed_options:
+        from .seed_data import seed_data
+        seed_data(transactions=seed_transactions, **seed_options)
+
+def percentile(samples, p: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def latency_summary(samples) -> str:
+    """p50/p99/max of samples given in seconds, printed in milliseconds."""
+    return (f"p50 {percentile(samples, 50) * 1000:.1f} ms, p99 {percentile(samples, 99) * 1000:.1f} ms, "
+            f"max {max(samples, default=0) * 1000:.1f} ms")
+
+@contextmanager
+def count_queries(engine):
+    """Count the statements sent through engine (sync or the sync_engine of an async one)."""
+    from sqlalchemy import event
+    counter = [0]
+
+    def before_cursor_execute(*args):
+        counter[0] += 1
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+@contextmanager
+def stopwatch():
+    elapsed = [0.0]
+    started = time.perf_counter()
+    try:
+        yield elapsed
+    finally:
+        elapsed[0] = time.perf_counter() - started
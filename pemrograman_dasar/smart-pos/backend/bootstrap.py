@@ -0,0 +1,50 @@
+import argparse
+import os
+from . import schemas, crud, migrations
+from .database import SessionLocal, engine
+from .migrations import current_version
+
+# Schema setup is an explicit step, not something the API does on import:
+#   python -m backend.bootstrap                # migrate schema, admin user
+#   python -m backend.bootstrap --seed 500     # ... plus 500 synthetic sales
+# The API only checks on startup that the database is at SCHEMA_VERSION.
+SCHEMA_VERSION = migrations.LATEST_VERSION
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = os.getenv("SMARTPOS_ADMIN_PASSWORD", "admin123")
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+def verify_schema(bind=engine):
+    version = current_version(bind)
+    if version != SCHEMA_VERSION:
+        found = "not initialised" if version is None else f"at version {version}"
+        raise SchemaOutOfDate(
+            f"Database schema is {found}, expected version {SCHEMA_VERSION}. "
+            "Run: python -m backend.bootstrap"
+        )
+
+def bootstrap(seed_transactions: int = 0):
+    migrations.upgrade(engine)
+
+    db = SessionLocal()
+    try:
+        if not crud.get_user_by_username(db, ADMIN_USERNAME):
+            crud.create_user(db, schemas.UserCreate(username=ADMIN_USERNAME, password=ADMIN_PASSWORD, role="admin"))
+            print(f"Admin user created: {ADMIN_USERNAME}")
+    finally:
+        db.close()
+
+    if seed_transactions:
+        from .seed_data import seed_data  # pulls in NumPy, only needed here
+        seed_data(transactions=seed_transactions)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create/upgrade the Smart POS database")
+    parser.add_argument("--seed", type=int, default=0, metavar="N",
+                        help="also generate N synthetic transactions (see backend.seed_data for more options)")
+    args = parser.parse_args(argv)
+    bootstrap(seed_transactions=args.seed)
+
+if __name__ == "__main__":
+    main()
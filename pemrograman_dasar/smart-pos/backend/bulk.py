@@ -0,0 +1,346 @@
+import codecs
+import csv
+import importlib.util
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from . import models, schemas, catalog_cache, database, table_versions
+
+# Rows are upserted IMPORT_CHUNK_SIZE at a time (one executemany + one commit per
+# chunk) and exports are fetched from a server-side cursor EXPORT_BATCH_SIZE rows
+# at a time, so neither side ever holds the whole catalog in memory.
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+PARQUET_ROW_GROUP_SIZE = 65536
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+PRODUCT_EXPORT_FIELDS = ["id", "name", "barcode", "price", "stock", "reorder_threshold", "category_id", "category"]
+TRANSACTION_EXPORT_FIELDS = [
+    "transaction_id", "created_at", "cashier_id", "cashier", "total_amount",
+    "item_id", "product_id", "barcode", "product", "category", "quantity", "price_at_sale",
+]
+
+async def iter_lines(chunks: AsyncIterator[bytes]):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str):
+    # Yields (line number, record dict or None, error message or None)
+    line_no = 0
+    if fmt == "ndjson":
+        async for line in iter_lines(chunks):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "expected a JSON object"
+                continue
+            yield line_no, record, None
+        return
+
+    header = None
+    pending: Optional[str] = None
+    start = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if pending is None:
+            pending, start = line, line_no
+        else:
+            pending += "\n" + line
+        if pending.count('"') % 2:
+            continue  # quoted field continues on the next line
+        text, pending = pending, None
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        yield start, {k: v for k, v in zip(header, values) if v.strip() != ""}, None
+    if pending is not None:
+        yield start, None, "unterminated quoted field"
+
+def parse_row(record: dict) -> schemas.ProductImportRow:
+    try:
+        row = schemas.ProductImportRow(**record)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+    row.barcode = row.barcode.strip()
+    if row.category is not None:
+        row.category = row.category.strip() or None
+    if not row.barcode:
+        raise ValueError("barcode: must not be empty")
+    if row.price < 0 or row.stock < 0 or row.reorder_threshold < 0:
+        raise ValueError("price, stock and reorder_threshold must not be negative")
+    if row.category_id is None and row.category is None:
+        raise ValueError("category or category_id is required")
+    return row
+
+def import_chunk(db: Session, rows):
+    """Upsert one chunk of (line, ProductImportRow) keyed on barcode.
+
+    Returns (created, updated, errors). Unknown category names are created."""
+    errors = []
+    names = {row.category for _, row in rows if row.category_id is None}
+    if names:
+        db.execute(
+            database.dialect_insert(db, models.Category.__table__).on_conflict_do_nothing(index_elements=["name"]),
+            [{"name": name} for name in names],
+        )
+    category_ids = dict(db.execute(
+        select(models.Category.name, models.Category.id).where(models.Category.name.in_(names))
+    ).all()) if names else {}
+    given_ids = {row.category_id for _, row in rows if row.category_id is not None}
+    known_ids = set(db.scalars(
+        select(models.Category.id).where(models.Category.id.in_(given_ids))
+    )) if given_ids else set()
+
+    values = {}
+    for line, row in rows:
+        category_id = row.category_id if row.category_id is not None else category_ids.get(row.category)
+        if row.category_id is not None and category_id not in known_ids:
+            errors.append((line, f"category_id {row.category_id} does not exist"))
+            continue
+        # A barcode repeated within the chunk: the last row wins
+        values[row.barcode] = {
+            "name": row.name,
+            "barcode": row.barcode,
+            "price": row.price,
+            "stock": row.stock,
+            "reorder_threshold": row.reorder_threshold,
+            "category_id": category_id,
+            "version": 1,
+        }
+    if not values:
+        if names:
+            table_versions.bump(db, "categories")
+        db.commit()
+        return 0, 0, errors
+
+    existing = set(db.scalars(select(models.Product.barcode).where(models.Product.barcode.in_(values))))
+    table = models.Product.__table__
+    stmt = database.dialect_insert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["barcode"],
+        set_={
+            "name": stmt.excluded.name,
+            "price": stmt.excluded.price,
+            "stock": stmt.excluded.stock,
+            "reorder_threshold": stmt.excluded.reorder_threshold,
+            "category_id": stmt.excluded.category_id,
+            "version": table.c.version + 1,
+        },
+    )
+    db.execute(stmt, list(values.values()))
+    table_versions.stamp_products(db, models.Product.barcode.in_(values), *(("categories",) if names else ()))
+    db.commit()
+    catalog_cache.invalidate(*values)
+    return len(values) - len(existing), len(existing), errors
+
+async def import_products(db: AsyncSession, chunks: AsyncIterator[bytes], fmt: str) -> schemas.ProductImportResult:
+    result = schemas.ProductImportResult()
+
+    def fail(line, message):
+        result.failed += 1
+        if len(result.errors) < MAX_REPORTED_ERRORS:
+            result.errors.append(schemas.ProductImportError(line=line, error=message))
+
+    async def flush(batch):
+        try:
+            created, updated, errors = await db.run_sync(import_chunk, batch)
+        except SQLAlchemyError as e:
+            await db.rollback()
+            message = str(getattr(e, "orig", None) or e)
+            for line, _ in batch:
+                fail(line, message)
+            return
+        result.created += created
+        result.updated += updated
+        for line, message in errors:
+            fail(line, message)
+
+    batch = []
+    async for line, record, error in iter_records(chunks, fmt):
+        if error is None:
+            try:
+                batch.append((line, parse_row(record)))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            fail(line, error)
+            continue
+        if len(batch) >= IMPORT_CHUNK_SIZE:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    return result
+
+def _csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+def format_rows(rows, fields, fmt: str) -> str:
+    if fmt == "csv":
+        return "".join(_csv_line(row) for row in rows)
+    return "".join(json.dumps(dict(zip(fields, row)), default=str) + "\n" for row in rows)
+
+async def export_products(fmt: str):
+    # Own session: the response body is produced after the endpoint has returned
+    async with database.AsyncSessionLocal() as db:
+        database.use_replica(db)
+        stmt = (
+            select(
+                models.Product.id,
+                models.Product.name,
+                models.Product.barcode,
+                models.Product.price,
+                models.Product.stock,
+                models.Product.reorder_threshold,
+                models.Product.category_id,
+                models.Category.name,
+            )
+            .outerjoin(models.Category, models.Product.category_id == models.Category.id)
+            .order_by(models.Product.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        result = await db.stream(stmt)
+        if fmt == "csv":
+            yield _csv_line(PRODUCT_EXPORT_FIELDS)
+        async for rows in result.partitions():
+            yield format_rows(rows, PRODUCT_EXPORT_FIELDS, fmt)
+
+def parquet_available() -> bool:
+    # pyarrow is optional and slow to import, so it is only loaded for a parquet export
+    return importlib.util.find_spec("pyarrow") is not None
+
+class _ChunkSink:
+    # Write-only file object for ParquetWriter; drain() hands back what was
+    # written since the last call so each row group can be streamed out.
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _transaction_export_schema():
+    import pyarrow
+
+    return pyarrow.schema([
+        ("transaction_id", pyarrow.int64()),
+        ("created_at", pyarrow.timestamp("us")),
+        ("cashier_id", pyarrow.int64()),
+        ("cashier", pyarrow.string()),
+        ("total_amount", pyarrow.float64()),
+        ("item_id", pyarrow.int64()),
+        ("product_id", pyarrow.int64()),
+        ("barcode", pyarrow.string()),
+        ("product", pyarrow.string()),
+        ("category", pyarrow.string()),
+        ("quantity", pyarrow.int64()),
+        ("price_at_sale", pyarrow.float64()),
+    ])
+
+async def export_transactions(start: Optional[datetime], end: Optional[datetime], fmt: str):
+    """One row per line item, oldest first; start is inclusive, end exclusive."""
+    Transaction, Item = models.Transaction, models.TransactionItem
+    stmt = (
+        select(
+            Transaction.id,
+            Transaction.created_at,
+            Transaction.cashier_id,
+            models.User.username,
+            Transaction.total_amount,
+            Item.id,
+            Item.product_id,
+            models.Product.barcode,
+            models.Product.name,
+            models.Category.name,
+            Item.quantity,
+            Item.price_at_sale,
+        )
+        .join(Item, Item.transaction_id == Transaction.id)
+        .outerjoin(models.User, models.User.id == Transaction.cashier_id)
+        .outerjoin(models.Product, models.Product.id == Item.product_id)
+        .outerjoin(models.Category, models.Category.id == models.Product.category_id)
+        .order_by(Transaction.created_at, Transaction.id, Item.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    if start is not None:
+        stmt = stmt.where(Transaction.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(Transaction.created_at < end)
+
+    async with database.AsyncSessionLocal() as db:
+        database.use_replica(db)
+        result = await db.stream(stmt)
+        if fmt != "parquet":
+            if fmt == "csv":
+                yield _csv_line(TRANSACTION_EXPORT_FIELDS)
+            async for rows in result.partitions():
+                yield format_rows(rows, TRANSACTION_EXPORT_FIELDS, fmt)
+            return
+
+        import pyarrow
+        import pyarrow.parquet
+
+        schema = _transaction_export_schema()
+        sink = _ChunkSink()
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+        batches, buffered = [], 0
+        async for rows in result.partitions():
+            batches.append(pyarrow.RecordBatch.from_pylist(
+                [dict(zip(TRANSACTION_EXPORT_FIELDS, row)) for row in rows], schema=schema
+            ))
+            buffered += len(rows)
+            if buffered >= PARQUET_ROW_GROUP_SIZE:
+                writer.write_table(pyarrow.Table.from_batches(batches, schema=schema))
+                batches, buffered = [], 0
+                yield sink.drain()
+        if batches:
+            writer.write_table(pyarrow.Table.from_batches(batches, schema=schema))
+        writer.close()
+        yield sink.drain()
@@ -0,0 +1,70 @@
+import threading
+import time
+from sqlalchemy.orm import Session, joinedload
+from . import models, schemas
+
+# In-process barcode -> product map for the scan endpoint. Entries are detached
+# schemas.Product snapshots; crud drops a barcode whenever that product is
+# created, deleted or its stock changes (and everything when a category is
+# deleted), and the next scan reloads it. Those drops only reach this process:
+# entries also expire after the TTL, which bounds how stale another worker's
+# writes can look here.
+# _generation moves on with every invalidation, so a load that raced one (read
+# the row, then a checkout committed and invalidated it) does not store what it read.
+CACHE_TTL_SECONDS = 5
+
+_products = {}  # barcode -> (expires_at, product)
+_generation = 0
+_lock = threading.Lock()
+
+def load(db: Session):
+    generation = _generation
+    snapshot = {
+        p.barcode: schemas.Product.from_orm(p)
+        for p in db.query(models.Product).options(joinedload(models.Product.category))
+    }
+    expires_at = time.monotonic() + CACHE_TTL_SECONDS
+    with _lock:
+        if _generation != generation:
+            return 0  # scans fill it one barcode at a time instead
+        _products.clear()
+        _products.update((barcode, (expires_at, product)) for barcode, product in snapshot.items())
+    return len(snapshot)
+
+def peek(barcode: str):
+    entry = _products.get(barcode)
+    if entry is None or entry[0] < time.monotonic():
+        return None
+    return entry[1]
+
+def get(db: Session, barcode: str):
+    product = peek(barcode)
+    if product is not None:
+        return product
+    generation = _generation
+    db_product = (
+        db.query(models.Product)
+        .options(joinedload(models.Product.category))
+        .filter(models.Product.barcode == barcode)
+        .first()
+    )
+    if db_product is None:
+        return None
+    product = schemas.Product.from_orm(db_product)
+    with _lock:
+        if _generation == generation:
+            _products[barcode] = (time.monotonic() + CACHE_TTL_SECONDS, product)
+    return product
+
+def invalidate(*barcodes):
+    global _generation
+    with _lock:
+        _generation += 1
+        for barcode in barcodes:
+            _products.pop(barcode, None)
+
+def clear():
+    global _generation
+    with _lock:
+        _generation += 1
+        _products.clear()
@@ -0,0 +1,318 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from . import benchmark
+
+# Portability checks for the dialect-specific paths in crud/stock (RETURNING,
+# row locks, upserts, tombstones, keyset cursors), run against a fresh SQLite
+# file and, with --postgres-url, against a scratch PostgreSQL database (it is
+# wiped and written to). Each backend runs in its own process because the
+# engines are built at import. Exits non-zero if any check fails.
+#   python -m backend.check_backends [--postgres-url postgresql+psycopg2://postgres@localhost/smartpos_check]
+
+CHECKS = []
+
+def check(function):
+    CHECKS.append(function)
+    return function
+
+def _product(db, name, stock=1000):
+    from . import crud, schemas
+    return crud.create_product(db, schemas.ProductCreate(
+        name=name, barcode=f"CHECK-{name}", price=1500, stock=stock, category_id=1
+    ))
+
+@check
+def server_defaults_and_returning(db, cashier_id):
+    from . import crud, schemas
+    product = _product(db, "defaults")
+    assert product.id and product.catalog_version > 0, "product id / catalog version not filled in"
+    sale = crud.create_transaction(db, schemas.TransactionCreate(
+        items=[{"product_id": product.id, "quantity": 2}]
+    ), cashier_id)
+    assert sale.created_at is not None and sale.total_amount == 3000, f"bad sale header {sale.total_amount}"
+    assert [(i.product_id, i.quantity) for i in sale.items] == [(product.id, 2)], "items not stored"
+
+@check
+def short_stock_rolls_back(db, cashier_id):
+    from . import crud, models, schemas, stock
+    product = _product(db, "short", stock=1)
+    before = db.query(models.Transaction).count()
+    try:
+        crud.create_transaction(db, schemas.TransactionCreate(
+            items=[{"product_id": product.id, "quantity": 2}]
+        ), cashier_id)
+    except stock.InsufficientStock:
+        pass
+    else:
+        raise AssertionError("sale over the stock was accepted")
+    db.expire_all()
+    assert db.query(models.Product.stock).filter(models.Product.id == product.id).scalar() == 1, "stock changed"
+    assert db.query(models.Transaction).count() == before, "a transaction was left behind"
+
+def _deadlocks(db):
+    if db.get_bind().dialect.name != "postgresql":
+        return 0
+    from sqlalchemy import text
+    db.commit()
+    db.execute(text("SELECT pg_stat_force_next_flush()"))
+    db.commit()  # statistics are read once per transaction
+    return db.execute(text("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")).scalar()
+
+@check
+def overlapping_carts(db, cashier_id):
+    # Carts over the same products, in opposite orders, from many threads at once:
+    # row locks must serialise them without deadlocks, lost updates or errors
+    from . import crud, models, schemas
+    from .database import SessionLocal
+    ids = [_product(db, f"overlap-{n}").id for n in range(4)]
+    carts = [
+        schemas.TransactionCreate(items=[{"product_id": i, "quantity": 1} for i in order])
+        for order in (ids, ids[::-1])
+    ]
+    threads, sales, errors = 16, 25, []
+    start = threading.Barrier(threads)
+    deadlocks = _deadlocks(db)
+
+    def cashier(n):
+        session = SessionLocal()
+        try:
+            start.wait()
+            for _ in range(sales):
+                crud.create_transaction(session, carts[n % 2], cashier_id)
+        except Exception as e:
+            errors.append(repr(e)[:200])
+        finally:
+            session.close()
+
+    workers = [threading.Thread(target=cashier, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert not errors, f"{len(errors)} checkouts failed: {errors[:2]}"
+    # Retries would hide them, so ask the server directly
+    assert _deadlocks(db) == deadlocks, f"{_deadlocks(db) - deadlocks} deadlocks (retried)"
+    db.expire_all()
+    stocks = [s for (s,) in db.query(models.Product.stock).filter(models.Product.id.in_(ids))]
+    assert stocks == [1000 - threads * sales] * len(ids), f"stock {stocks}, expected {1000 - threads * sales} each"
+
+@check
+def ordered_row_locks(db, cashier_id):
+    # The interleaving that deadlocks carts which lock rows out of id order: A
+    # has to wait for a row while B can still grab one of A's later rows
+    from . import stock
+    from .database import SessionLocal
+    if db.get_bind().dialect.name != "postgresql":
+        return "no row locks on this backend"
+    ids = [_product(db, f"ordered-{n}").id for n in range(4)]
+    holders = [SessionLocal(), SessionLocal()]
+    errors = []
+
+    def cart(hold):
+        session = SessionLocal()
+        try:
+            stock.lock_products(session, ids)
+            time.sleep(hold)
+        except Exception as e:
+            errors.append(repr(e)[:200])
+        finally:
+            session.rollback()
+            session.close()
+
+    try:
+        stock.lock_products(holders[0], [ids[0]])
+        stock.lock_products(holders[1], [ids[2]])
+        a = threading.Thread(target=cart, args=(0.5,))
+        a.start()
+        time.sleep(0.3)
+        holders[1].rollback()
+        b = threading.Thread(target=cart, args=(0,))
+        b.start()
+        time.sleep(0.3)
+        holders[0].rollback()
+        a.join()
+        b.join()
+    finally:
+        for holder in holders:
+            holder.close()
+    assert not errors, f"{errors[0]}"
+
+@check
+def deadlocks_are_retried(db, cashier_id):
+    # Two sessions lock the same two rows in opposite order, so PostgreSQL has to
+    # abort one with a deadlock (40P01). run_with_retry and run_with_retry_async
+    # must both retry it: psycopg2 raises it as OperationalError, asyncpg as a
+    # plain DBAPIError. Each async session gets its own loop and engine.
+    import asyncio
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from . import models, stock
+    from .database import SessionLocal, make_async_engine
+    if db.get_bind().dialect.name != "postgresql":
+        return "no deadlocks on this backend"
+    ids = [_product(db, f"deadlock-{n}").id for n in range(2)]
+
+    def grab(session, first, second, attempts, barrier):
+        attempts.append(first)
+        session.query(models.Product).filter(models.Product.id == first).with_for_update().one()
+        if len(attempts) == 1:
+            barrier.wait(5)  # both hold their first row before asking for the second
+        session.query(models.Product).filter(models.Product.id == second).with_for_update().one()
+        session.commit()
+
+    def sync_client(order, attempts, barrier, errors):
+        session = SessionLocal()
+        try:
+            stock.run_with_retry(session, lambda: grab(session, *order, attempts, barrier))
+        except Exception as e:
+            errors.append(repr(e)[:200])
+        finally:
+            session.close()
+
+    def async_client(order, attempts, barrier, errors):
+        async def client():
+            engine = make_async_engine()
+            try:
+                async with AsyncSession(engine) as session:
+                    await stock.run_with_retry_async(session, grab, *order, attempts, barrier)
+            finally:
+                await engine.dispose()
+        try:
+            asyncio.run(client())
+        except Exception as e:
+            errors.append(repr(e)[:200])
+
+    for name, client in (("sync", sync_client), ("async", async_client)):
+        barrier, errors = threading.Barrier(2), []
+        attempts = [[], []]
+        threads = [
+            threading.Thread(target=client, args=(order, tries, barrier, errors))
+            for order, tries in zip((ids, ids[::-1]), attempts)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, f"{name}: {errors[0]}"
+        assert len(attempts[0]) + len(attempts[1]) > 2, f"{name}: no deadlock happened, nothing was retried"
+
+@check
+def recategorised_sale_stays_in_its_category(db, cashier_id):
+    # A product moves category after a sale: a rollup rebuild must keep the sale
+    # where it was sold, and deleting it must take it back out of that category
+    from . import crud, rollups, schemas
+    moved_to = crud.create_category(db, schemas.CategoryCreate(name="check-recategorised"))
+    product = _product(db, "recategorised")
+
+    def category_sales():
+        return {c["category_id"]: (round(c["revenue"], 2), c["units"]) for c in crud.get_category_sales(db)}
+
+    before = category_sales()
+    sale = crud.checkout(db, {product.id: 3}, cashier_id)
+    sold = category_sales()
+    product.category_id = moved_to.id
+    db.commit()
+    rollups.rebuild(db)
+    assert category_sales() == sold, f"rebuild moved the sale: {sold} became {category_sales()}"
+    crud.delete_transaction(db, sale)
+    assert category_sales() == before, f"delete left {category_sales()}, expected {before}"
+
+@check
+def idempotent_checkout(db, cashier_id):
+    from . import crud
+    product = _product(db, "idempotent")
+    first = crud.checkout_once(db, {product.id: 1}, cashier_id, "check-key-1")
+    again = crud.checkout_once(db, {product.id: 1}, cashier_id, "check-key-1")
+    assert first[1] and again == (first[0], False), f"{first} then {again}"
+
+@check
+def delete_leaves_tombstone(db, cashier_id):
+    from . import crud
+    product = _product(db, "deleted")
+    since, _, _ = crud.get_product_changes(db)
+    crud.delete_product(db, product.id)
+    _, changed, deleted = crud.get_product_changes(db, since=since)
+    assert deleted == [product.id] and not changed, f"changes {changed}, deleted {deleted}"
+
+@check
+def cursor_pages_match_listing(db, cashier_id):
+    from . import crud, pagination
+    product = _product(db, "paged")
+    for _ in range(120):
+        crud.checkout(db, {product.id: 1}, cashier_id)
+    listing = [t.id for t in crud.get_transactions(db, limit=10 ** 6)]
+    paged, cursor = [], None
+    while True:
+        page = crud.get_transactions(db, limit=37, cursor=cursor)
+        paged += [t.id for t in page]
+        if len(page) < 37:
+            break
+        cursor = pagination.encode_cursor(page[-1].created_at, page[-1].id)
+    assert paged == listing, f"cursor pages returned {len(paged)} rows, listing {len(listing)}"
+
+@check
+def malformed_cursors_are_rejected(db, cashier_id):
+    # Anything but a cursor we issued must be a ValueError (the routers' 400),
+    # including valid base64 JSON of the wrong shape
+    import base64, json
+    from . import crud
+    listings = (crud.get_categories, crud.get_products, crud.get_product_changes, crud.get_transactions)
+    shapes = [{"a": 1}, {"2026-01-01T00:00:00": 1, "5": 2}, "x", 7, None, [], [[1]], ["a", "b", "c"]]
+    cursors = ["not a cursor", "e30"] + [base64.urlsafe_b64encode(json.dumps(s).encode()).decode() for s in shapes]
+    for listing in listings:
+        for cursor in cursors:
+            try:
+                listing(db, cursor=cursor)
+            except ValueError:
+                continue
+            except Exception as e:
+                raise AssertionError(f"{listing.__name__}(cursor={cursor!r}) raised {e!r}")
+            raise AssertionError(f"{listing.__name__}(cursor={cursor!r}) was accepted")
+
+def run():
+    from . import crud
+    from .database import SessionLocal, engine
+    benchmark.setup(skus=1)
+    failed = 0
+    for function in CHECKS:
+        db = SessionLocal()
+        try:
+            skipped = function(db, crud.get_user_by_username(db, "admin").id)
+            print(f"  skip  {function.__name__}: {skipped}" if skipped else f"  ok    {function.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"  FAIL  {function.__name__}: {e!r}"[:300])
+        finally:
+            db.close()
+    engine.dispose()
+    if failed:
+        raise SystemExit(f"{failed} of {len(CHECKS)} checks failed on {engine.dialect.name}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the portability checks on SQLite and PostgreSQL")
+    parser.add_argument("--postgres-url", help="scratch PostgreSQL database to check as well (it gets written to)")
+    benchmark.add_database_argument(parser)
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        benchmark.use_scratch_database(args.database_url)
+        run()
+        return
+
+    urls = [f"sqlite:///{tempfile.mkdtemp(prefix='smartpos-check-')}/check.db"]
+    if args.postgres_url:
+        urls.append(args.postgres_url)
+    failures = 0
+    for url in urls:
+        child = [sys.executable, "-m", "backend.check_backends", "--database-url", url]
+        failures += subprocess.run(child, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).returncode != 0
+    if failures:
+        raise SystemExit(f"checks failed on {failures} of {len(urls)} backends")
+    print(f"all checks passed on {len(urls)} backend(s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
-from sqlalchemy.orm import Session
-from . import models, schemas
-from .auth import get_password_hash
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import func, insert, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, subqueryload
+from . import models, schemas, stock, pagination, rollups, catalog_cache, table_versions, database
+from .auth import get_password_hash, invalidate_user
 
 # User
 def get_user_by_username(db: Session, username: str):
@@ -14,13 +18,28 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
+def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
+    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    if db_user:
+        for field, value in user.dict(exclude_unset=True).items():
+            setattr(db_user, field, value)
+        db.commit()
+        db.refresh(db_user)
+        # Role / active flag changed: drop the cached principal straight away
+        invalidate_user(db_user.username)
+    return db_user
+
 # Category
-def get_categories(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Category).offset(skip).limit(limit).all()
+def get_categories(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    query = db.query(models.Category).order_by(models.Category.id)
+    if cursor:
+        return query.filter(models.Category.id > pagination.decode_id_cursor(cursor)).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
 
 def create_category(db: Session, category: schemas.CategoryCreate):
     db_category = models.Category(name=category.name)
     db.add(db_category)
+    table_versions.bump(db, "categories")
     db.commit()
     db.refresh(db_category)
     return db_category
@@ -29,82 +48,282 @@ def delete_category(db: Session, category_id: int):
     category = db.query(models.Category).filter(models.Category.id == category_id).first()
     if category:
         db.delete(category)
+        table_versions.bump(db, "categories")
         db.commit()
+        # Cached scans embed the category
+        catalog_cache.clear()
     return category
 
 # Product
-def get_products(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Product).offset(skip).limit(limit).all()
+def get_products(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    query = db.query(models.Product).options(joinedload(models.Product.category)).order_by(models.Product.id)
+    if cursor:
+        return query.filter(models.Product.id > pagination.decode_id_cursor(cursor)).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
+def get_low_stock_products(db: Session, threshold: Optional[int] = None, limit: int = 100):
+    query = db.query(models.Product).options(joinedload(models.Product.category))
+    if threshold is not None:
+        query = query.filter(models.Product.stock < threshold)
+    else:
+        # Same predicate as ix_products_below_reorder, so SQLite can use the partial index
+        query = query.filter(models.Product.stock < models.Product.reorder_threshold)
+    # Most urgent first: emptiest shelf, then furthest below its reorder point
+    return query.order_by(
+        models.Product.stock,
+        models.Product.stock - models.Product.reorder_threshold,
+        models.Product.id,
+    ).limit(limit).all()
 
 def create_product(db: Session, product: schemas.ProductCreate):
     db_product = models.Product(**product.dict())
     db.add(db_product)
+    db.flush()
+    table_versions.stamp_products(db, models.Product.id == db_product.id)
     db.commit()
     db.refresh(db_product)
+    catalog_cache.invalidate(db_product.barcode)
     return db_product
 
+def get_product_changes(db: Session, since: int = 0, limit: int = 1000, cursor: Optional[str] = None):
+    """Products changed and ids deleted after catalog version `since`.
+
+    The version is read before the rows, so anything changed meanwhile is sent
+    again next time rather than missed. Later pages carry the first page's
+    version in their cursor; deletions come with the first page only."""
+    if cursor:
+        version, after_version, after_id = pagination.decode_int_cursor(cursor, 3)
+    else:
+        version = table_versions.current(db, "products")
+    query = (
+        db.query(models.Product)
+        .options(joinedload(models.Product.category))
+        .filter(models.Product.catalog_version > since)
+        .order_by(models.Product.catalog_version, models.Product.id)
+    )
+    if cursor:
+        # catalog_version >= bound lets the index seek straight to the cursor, as in get_transactions
+        query = query.filter(
+            models.Product.catalog_version >= after_version,
+            or_(models.Product.catalog_version > after_version, models.Product.id > after_id),
+        )
+    deleted = [] if cursor else [
+        product_id for (product_id,) in
+        db.query(models.ProductTombstone.product_id).filter(models.ProductTombstone.catalog_version > since)
+    ]
+    return version, query.limit(limit).all(), deleted
+
 def get_product_by_barcode(db: Session, barcode: str):
     return db.query(models.Product).filter(models.Product.barcode == barcode).first()
 
 def update_product_stock(db: Session, product_id: int, quantity_sold: int):
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
-    if product:
-        product.stock -= quantity_sold
+    def apply():
+        if not stock.adjust(db, product_id, -quantity_sold):
+            db.rollback()
+            product = db.query(models.Product).filter(models.Product.id == product_id).first()
+            if product:
+                raise stock.InsufficientStock([product.name])
+            return None
+        table_versions.stamp_products(db, models.Product.id == product_id)
         db.commit()
-        db.refresh(product)
+        return db.query(models.Product).filter(models.Product.id == product_id).first()
+    product = stock.run_with_retry(db, apply)
+    if product:
+        catalog_cache.invalidate(product.barcode)
     return product
 
 def delete_product(db: Session, product_id: int):
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
     if product:
+        barcode = product.barcode
         db.delete(product)
+        db.flush()
+        version = table_versions.bump(db, "products")["products"]
+        tombstone = database.dialect_insert(db, models.ProductTombstone.__table__).values(
+            product_id=product_id, catalog_version=version, deleted_at=datetime.utcnow()
+        )
+        # SQLite may hand a deleted id out again, so a tombstone can already exist
+        db.execute(tombstone.on_conflict_do_update(
+            index_elements=["product_id"],
+            set_={"catalog_version": version, "deleted_at": tombstone.excluded.deleted_at},
+        ))
         db.commit()
+        catalog_cache.invalidate(barcode)
     return product
 
 # Transaction
-def create_transaction(db: Session, transaction: schemas.TransactionCreate, cashier_id: int):
-    # Calculate total and verify stock
-    total_amount = 0
-    
-    # Create transaction record
-    db_transaction = models.Transaction(cashier_id=cashier_id, total_amount=0) # Update total later
-    db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
+def _transaction_query(db: Session):
+    # Load the whole graph the response schema walks (items -> product -> category,
+    # plus cashier) up front: two queries per page whatever its size. subqueryload
+    # rather than selectinload, which splits its IN list into chunks of 500 ids.
+    return db.query(models.Transaction).options(
+        joinedload(models.Transaction.cashier),
+        subqueryload(models.Transaction.items)
+        .joinedload(models.TransactionItem.product)
+        .joinedload(models.Product.category),
+    )
 
+def cart_quantities(transaction: schemas.TransactionCreate):
+    # Merge repeated lines so every product is checked and decremented once
+    quantities = {}
     for item in transaction.items:
-        product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-        if not product:
-            continue # Should handle error
-        if product.stock < item.quantity:
-            continue # Should handle error
-        
-        # Deduct stock
-        product.stock -= item.quantity
-        
-        # Add item
-        price = product.price
-        total_amount += price * item.quantity
-        
-        db_item = models.TransactionItem(
-            transaction_id=db_transaction.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price_at_sale=price
-        )
-        db.add(db_item)
-    
-    db_transaction.total_amount = total_amount
+        if item.quantity <= 0:
+            raise ValueError(f"Invalid quantity for product {item.product_id}")
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    if not quantities:
+        raise ValueError("Transaction has no items")
+    return quantities
+
+def checkout(db: Session, quantities: dict, cashier_id: int, idempotency_key: Optional[str] = None,
+             created_at: Optional[datetime] = None):
+    # One attempt at the sale; callers wrap it in stock.run_with_retry
+    products = stock.lock_products(db, list(quantities))
+    missing = [str(product_id) for product_id in quantities if product_id not in products]
+    if missing:
+        raise ValueError(f"Product not found: {', '.join(missing)}")
+
+    # Stock is taken first; if any line is short the whole sale is rolled back
+    stock.reserve(db, quantities, products)
+
+    lines = [
+        (product_id, products[product_id].category_id, quantity, products[product_id].price)
+        for product_id, quantity in quantities.items()
+    ]
+    db_transaction = models.Transaction(
+        cashier_id=cashier_id,
+        total_amount=sum(price * quantity for _, _, quantity, price in lines),
+        created_at=created_at or datetime.utcnow(),
+        idempotency_key=idempotency_key,
+    )
+    db.add(db_transaction)
+    db.flush()
+    # One executemany for the items: ORM inserts would fetch every new item id
+    # with its own INSERT ... RETURNING on SQLite
+    db.execute(insert(models.TransactionItem.__table__), [
+        {"transaction_id": db_transaction.id, "product_id": product_id, "category_id": category_id,
+         "quantity": quantity, "price_at_sale": price}
+        for product_id, category_id, quantity, price in lines
+    ])
+    rollups.record(db, db_transaction.created_at, lines)
+    barcodes = [p.barcode for p in products.values()]
+    table_versions.stamp_products(db, models.Product.id.in_(quantities), "sales_rollups", "transactions")
     db.commit()
-    db.refresh(db_transaction)
-    return db_transaction
+    catalog_cache.invalidate(*barcodes)
+    return db_transaction.id
+
+def _transaction_id_for_key(db: Session, idempotency_key: str):
+    return db.query(models.Transaction.id).filter(models.Transaction.idempotency_key == idempotency_key).scalar()
+
+def checkout_once(db: Session, quantities: dict, cashier_id: int, idempotency_key: str,
+                  created_at: Optional[datetime] = None):
+    """checkout() at most once per idempotency key; returns (transaction_id, created).
+
+    created_at is the register's clock: stored as naive UTC, never in the future."""
+    existing = _transaction_id_for_key(db, idempotency_key)
+    if existing is not None:
+        return existing, False
+    if created_at is not None:
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+        created_at = min(created_at, datetime.utcnow())
+    try:
+        return checkout(db, quantities, cashier_id, idempotency_key, created_at), True
+    except IntegrityError:
+        # The same sale, sent again while the first copy was still committing
+        db.rollback()
+        existing = _transaction_id_for_key(db, idempotency_key)
+        if existing is None:
+            raise
+        return existing, False
+
+def create_transaction(db: Session, transaction: schemas.TransactionCreate, cashier_id: int):
+    quantities = cart_quantities(transaction)
+    transaction_id = stock.run_with_retry(db, lambda: checkout(db, quantities, cashier_id))
+    return get_transaction(db, transaction_id)
 
-def get_transactions(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Transaction).offset(skip).limit(limit).all()
+def get_transaction(db: Session, transaction_id: int):
+    return _transaction_query(db).filter(models.Transaction.id == transaction_id).first()
+
+def get_transactions(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    # Newest first, keyed on (created_at, id) to match ix_transactions_created_at_id
+    query = _transaction_query(db).order_by(models.Transaction.created_at.desc(), models.Transaction.id.desc())
+    if cursor:
+        created_at, transaction_id = pagination.decode_time_id_cursor(cursor)
+        # The redundant created_at <= bound is what lets the planner seek into the
+        # index; with the OR alone SQLite scans it from the newest row down.
+        query = query.filter(
+            models.Transaction.created_at <= created_at,
+            or_(models.Transaction.created_at < created_at, models.Transaction.id < transaction_id),
+        )
+        return query.limit(limit).all()
+    return query.offset(skip).limit(limit).all()
 
 def delete_transaction(db: Session, transaction_id: int):
-    transaction = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
+    transaction = _transaction_query(db).filter(models.Transaction.id == transaction_id).first()
     if transaction:
+        # Taken back out under the category it was sold in, not the product's current one
+        rollups.record(db, transaction.created_at, [
+            (item.product_id, item.category_id, item.quantity, item.price_at_sale)
+            for item in transaction.items
+        ], sign=-1)
         db.delete(transaction)
+        table_versions.bump(db, "sales_rollups", "transactions")
         db.commit()
     return transaction
+
+# Analytics
+# Read from the rollup tables, so cost follows the number of buckets, not sales.
+# start/end are matched against bucket starts (whole hours or days).
+def _rollup_query(db: Session, model, period: str, start=None, end=None):
+    query = db.query(model).filter(model.period == period)
+    if start:
+        query = query.filter(model.bucket_start >= rollups.bucket_start(start, period))
+    if end:
+        query = query.filter(model.bucket_start < end)
+    return query
+
+def get_sales_summary(db: Session, start=None, end=None):
+    # Whole days are enough without a range; a range needs hourly precision
+    period = "hour" if start or end else "day"
+    count, revenue = (
+        _rollup_query(db, models.SalesRollup, period, start, end)
+        .with_entities(
+            func.coalesce(func.sum(models.SalesRollup.tickets), 0),
+            func.coalesce(func.sum(models.SalesRollup.revenue), 0),
+        )
+        .one()
+    )
+    return {
+        "transaction_count": count,
+        "total_revenue": revenue,
+        "average_order": revenue / count if count else 0,
+    }
+
+def get_revenue_timeseries(db: Session, bucket: str = "hour", start=None, end=None):
+    rows = (
+        _rollup_query(db, models.SalesRollup, bucket, start, end)
+        .filter(models.SalesRollup.tickets > 0)
+        .order_by(models.SalesRollup.bucket_start)
+        .all()
+    )
+    return [{"bucket": r.bucket_start, "revenue": r.revenue, "transactions": r.tickets} for r in rows]
+
+def get_category_sales(db: Session, start=None, end=None):
+    period = "hour" if start or end else "day"
+    rows = (
+        _rollup_query(db, models.ProductSalesRollup, period, start, end)
+        .outerjoin(models.Category, models.Category.id == models.ProductSalesRollup.category_id)
+        .with_entities(
+            models.ProductSalesRollup.category_id,
+            models.Category.name,
+            func.sum(models.ProductSalesRollup.revenue),
+            func.sum(models.ProductSalesRollup.units),
+        )
+        .group_by(models.ProductSalesRollup.category_id, models.Category.name)
+        .all()
+    )
+    return [
+        {"category_id": category_id, "category": name or "Uncategorized", "revenue": revenue, "units": units}
+        for category_id, name, revenue, units in rows
+        if units
+    ]
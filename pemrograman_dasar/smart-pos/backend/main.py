@@ -1,9 +1,9 @@
-from fastapi import FastAPI
+import threading
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from . import models, database, crud, schemas
-from .routers import auth, products, transactions
-
-models.Base.metadata.create_all(bind=database.engine)
+from fastapi.middleware.gzip import GZipMiddleware
+from . import database, bootstrap, catalog_cache
+from .routers import auth, products, transactions, analytics
 
 app = FastAPI(title="Smart POS System")
 
@@ -13,31 +13,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# Product lists and exports are repetitive JSON/CSV; level 5 keeps CPU cost low
+app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=5)
+
+@app.middleware("http")
+async def replica_read_your_writes(request: Request, call_next):
+    # A successful write makes this client's next reads stick to the primary
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        database.mark_written(request.headers.get("Authorization"))
+    return response
 
 app.include_router(auth.router)
 app.include_router(products.router)
 app.include_router(transactions.router)
+app.include_router(analytics.router)
 
-@app.on_event("startup")
-def startup_event():
+def warm_catalog_cache():
     db = database.SessionLocal()
-    
-    # 1. Create Admin User
-    user = crud.get_user_by_username(db, "admin")
-    if not user:
-        admin_data = schemas.UserCreate(username="admin", password="admin123", role="admin")
-        crud.create_user(db, admin_data)
-        print("Admin user created: admin/admin123")
-    db.close()
-
-    # 2. Auto-seed Products & Data
     try:
-        from .seed_data import seed_data
-        seed_data()
-        print("Auto-seeding check complete.")
-    except Exception as e:
-        print(f"Auto-seeding skipped/failed: {e}")
+        print(f"Barcode cache loaded: {catalog_cache.load(db)} products")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def startup_event():
+    # 1. Schema, admin user and seed data come from `python -m backend.bootstrap`
+    bootstrap.verify_schema()
+
+    # 2. Warm the barcode scan cache without holding up startup (misses fall back to the DB)
+    threading.Thread(target=warm_catalog_cache, daemon=True).start()
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,264 @@
+import argparse
+import time
+from typing import Callable, NamedTuple, Optional
+from sqlalchemy import MetaData, func, inspect, select, text
+from . import models, rollups, search, table_versions
+from .database import SessionLocal, dialect_insert, engine
+
+# Versioned schema migrations for models.py:
+#   python -m backend.migrations status
+#   python -m backend.migrations upgrade [--batch-size 5000]
+# Every step looks at the live schema before changing it, so a step that finds
+# its column/index already there (e.g. on a database create_all just built) is
+# a no-op, and an interrupted upgrade can simply be run again.
+#
+# Keeping a live database usable while it upgrades:
+# - new columns carry a constant DEFAULT, which SQLite and PostgreSQL 11+ add
+#   without rewriting the table; on PostgreSQL the ALTER gives up after
+#   MIGRATION_LOCK_TIMEOUT instead of queueing every query behind a long reader;
+# - PostgreSQL indexes are built with CREATE INDEX CONCURRENTLY. SQLite has no
+#   online index build: writers wait (busy_timeout) for that one statement;
+# - data backfills run in id ranges of --batch-size rows, one commit per batch.
+#   Sales still taken by an API running the previous release after the rollup
+#   backfill has finished are not in the rollups; once the new release serves
+#   traffic, `python -m backend.rollups check` / `rebuild` reconciles them.
+
+MIGRATION_LOCK_TIMEOUT = "5s"
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable  # upgrade(bind, batch_size)
+
+def _progress(label: str):
+    started = time.perf_counter()
+    last_report = [0.0]
+
+    def report(done: int, total: int):
+        elapsed = time.perf_counter() - started
+        if done < total and elapsed - last_report[0] < 1.0:
+            return
+        last_report[0] = elapsed
+        rate = done / elapsed if elapsed else 0
+        print(f"  {label}: {done:,}/{total:,} ({done / max(total, 1):.0%}, {rate:,.0f}/s)", flush=True)
+    return report
+
+def add_column(bind, column) -> bool:
+    table = column.table.name
+    with bind.begin() as conn:
+        if column.name in {c["name"] for c in inspect(conn).get_columns(table)}:
+            return False
+        ddl = f"ALTER TABLE {table} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"
+        if column.server_default is not None:
+            ddl += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(f"SET LOCAL lock_timeout = '{MIGRATION_LOCK_TIMEOUT}'"))
+        conn.execute(text(ddl))
+    print(f"  added column {table}.{column.name}")
+    return True
+
+def _index(model, name: str):
+    return next(index for index in model.__table__.indexes if index.name == name)
+
+def create_index(bind, model, name: str) -> bool:
+    index = _index(model, name)
+    table = index.table.name
+    with bind.connect() as conn:
+        exists = name in {i["name"] for i in inspect(conn).get_indexes(table)}
+        if exists and conn.dialect.name == "postgresql":
+            # A failed CONCURRENTLY build leaves an INVALID index behind; redo it
+            valid = conn.scalar(text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+            ), {"name": name})
+            if not valid:
+                conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+                conn.commit()
+                exists = False
+    if exists:
+        return False
+
+    started = time.perf_counter()
+    if bind.dialect.name == "postgresql":
+        # CONCURRENTLY cannot run inside a transaction; build it from a copy of
+        # the table so the models' own Index objects stay untouched
+        concurrent = next(i for i in index.table.to_metadata(MetaData()).indexes if i.name == name)
+        concurrent.dialect_kwargs["postgresql_concurrently"] = True
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            concurrent.create(conn)
+    else:
+        with bind.begin() as conn:
+            index.create(conn)
+    print(f"  built index {name} in {time.perf_counter() - started:.1f}s")
+    return True
+
+def backfill(bind, label: str, id_column, step, batch_size: int):
+    """Call step(db, first_id, last_id) over id ranges of batch_size, committing each.
+
+    Keeps going until it reaches the newest id, including rows added meanwhile."""
+    db = SessionLocal(bind=bind)
+    try:
+        low, high = db.execute(select(func.min(id_column), func.max(id_column))).one()
+        if low is None:
+            return
+        report = _progress(label)
+        first = low
+        while first <= high:
+            last = min(first + batch_size - 1, high)
+            step(db, first, last)
+            db.commit()
+            report(last - low + 1, high - low + 1)
+            first = last + 1
+            if first > high:
+                high = db.scalar(select(func.max(id_column)))
+    finally:
+        db.close()
+
+# --- migration steps ---
+
+def _base_tables(bind, batch_size):
+    # Creates whatever table is missing, already in its current shape; the
+    # following steps bring tables that existed before up to date
+    models.Base.metadata.create_all(bind=bind)
+
+def _product_version(bind, batch_size):
+    add_column(bind, models.Product.__table__.c.version)
+
+def _reorder_threshold(bind, batch_size):
+    add_column(bind, models.Product.__table__.c.reorder_threshold)
+    create_index(bind, models.Product, "ix_products_stock")
+    create_index(bind, models.Product, "ix_products_below_reorder")
+
+def _transactions_created_at(bind, batch_size):
+    create_index(bind, models.Transaction, "ix_transactions_created_at_id")
+
+def _transaction_items_transaction_id(bind, batch_size):
+    create_index(bind, models.TransactionItem, "ix_transaction_items_transaction_id")
+
+def _transaction_items_product_id(bind, batch_size):
+    create_index(bind, models.TransactionItem, "ix_transaction_items_product_id")
+
+def _sales_rollups(bind, batch_size):
+    for model in (models.SalesRollup, models.ProductSalesRollup):
+        model.__table__.create(bind, checkfirst=True)
+    db = SessionLocal(bind=bind)
+    try:
+        populated = db.query(models.SalesRollup.id).first() is not None
+    finally:
+        db.close()
+    if not populated:
+        backfill(bind, "sales rollups", models.Transaction.id, rollups.backfill_range, batch_size)
+
+def _product_search(bind, batch_size):
+    search.ensure_index(bind)
+
+def _table_versions(bind, batch_size):
+    table = models.TableVersion.__table__
+    table.create(bind, checkfirst=True)
+    db = SessionLocal(bind=bind)
+    try:
+        db.execute(
+            dialect_insert(db, table).on_conflict_do_nothing(index_elements=["name"]),
+            [{"name": name, "version": 1} for name in table_versions.TRACKED],
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def _catalog_changes(bind, batch_size):
+    # Existing rows keep the column default (1): a first sync from 0 gets them all
+    add_column(bind, models.Product.__table__.c.catalog_version)
+    create_index(bind, models.Product, "ix_products_catalog_version")
+    models.ProductTombstone.__table__.create(bind, checkfirst=True)
+
+def _idempotency_keys(bind, batch_size):
+    # Existing sales stay NULL; the unique index allows any number of those
+    add_column(bind, models.Transaction.__table__.c.idempotency_key)
+    create_index(bind, models.Transaction, "ix_transactions_idempotency_key")
+
+def _fill_item_categories(db, first_id, last_id):
+    items = models.TransactionItem.__table__
+    db.execute(
+        items.update()
+        .where(items.c.id.between(first_id, last_id), items.c.category_id.is_(None))
+        .values(category_id=select(models.Product.category_id)
+                .where(models.Product.id == items.c.product_id)
+                .scalar_subquery())
+    )
+
+def _item_categories(bind, batch_size):
+    # Sales from before this step only know the product's current category
+    add_column(bind, models.TransactionItem.__table__.c.category_id)
+    backfill(bind, "transaction item categories", models.TransactionItem.id, _fill_item_categories, batch_size)
+
+MIGRATIONS = [
+    Migration(1, "base tables", _base_tables),
+    Migration(2, "products.version for optimistic stock locking", _product_version),
+    Migration(3, "products.reorder_threshold and low-stock indexes", _reorder_threshold),
+    Migration(4, "transactions (created_at, id) index", _transactions_created_at),
+    Migration(5, "transaction_items.transaction_id index", _transaction_items_transaction_id),
+    Migration(6, "transaction_items.product_id index", _transaction_items_product_id),
+    # After the item indexes: the backfill reads items by transaction id range
+    Migration(7, "sales rollup tables, backfilled from history", _sales_rollups),
+    Migration(8, "FTS5 product search index", _product_search),
+    Migration(9, "table version counters for ETags", _table_versions),
+    Migration(10, "products.catalog_version and tombstones for /products/changes", _catalog_changes),
+    Migration(11, "transactions.idempotency_key for the offline sales queue", _idempotency_keys),
+    Migration(12, "transaction_items.category_id, the category at sale time", _item_categories),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+def current_version(bind=engine) -> Optional[int]:
+    with bind.connect() as conn:
+        if not inspect(conn).has_table(models.SchemaVersion.__tablename__):
+            return None
+        return conn.scalar(select(func.max(models.SchemaVersion.version)))
+
+def _ensure_history(bind):
+    models.SchemaVersion.__table__.create(bind, checkfirst=True)
+    # The first version of this table only had the version column
+    add_column(bind, models.SchemaVersion.__table__.c.description)
+    add_column(bind, models.SchemaVersion.__table__.c.applied_at)
+
+def upgrade(bind=engine, batch_size: int = 5000, target: Optional[int] = None):
+    _ensure_history(bind)
+    current = current_version(bind) or 0
+    target = LATEST_VERSION if target is None else target
+    pending = [m for m in MIGRATIONS if current < m.version <= target]
+    if not pending:
+        print(f"Schema is up to date (version {current})")
+        return current
+    for migration in pending:
+        print(f"Applying {migration.version}: {migration.description}", flush=True)
+        started = time.perf_counter()
+        migration.upgrade(bind, batch_size)
+        db = SessionLocal(bind=bind)
+        try:
+            db.add(models.SchemaVersion(version=migration.version, description=migration.description))
+            db.commit()
+        finally:
+            db.close()
+        print(f"  version {migration.version} done in {time.perf_counter() - started:.1f}s", flush=True)
+    return pending[-1].version
+
+def status(bind=engine):
+    current = current_version(bind)
+    print(f"Current schema version: {current if current is not None else 'none'} (latest {LATEST_VERSION})")
+    for migration in MIGRATIONS:
+        mark = "applied" if current is not None and migration.version <= current else "pending"
+        print(f"  [{mark}] {migration.version}: {migration.description}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Smart POS schema migrations")
+    parser.add_argument("command", choices=["status", "upgrade"])
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per backfill batch/commit")
+    parser.add_argument("--target", type=int, default=None, help="stop at this version (default: latest)")
+    args = parser.parse_args(argv)
+    if args.command == "status":
+        status()
+    else:
+        upgrade(batch_size=args.batch_size, target=args.target)
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,15 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime
+from sqlalchemy import func, text, true, Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from .database import Base
+from .database import Base, engine
+
+def _partial_index(where: str):
+    # Partial-index predicates are dialect options, and naming one makes SQLAlchemy
+    # import that whole dialect. Only the dialect in use gets it (SQLite-only
+    # installs skip sqlalchemy.dialects.postgresql, ~50 ms of import time)
+    if engine.dialect.name not in ("sqlite", "postgresql"):
+        return {}
+    return {f"{engine.dialect.name}_where": text(where)}
 
 class User(Base):
     __tablename__ = "users"
@@ -10,7 +18,7 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     role = Column(String) # "admin" or "cashier"
-    is_active = Column(Boolean, default=True)
+    is_active = Column(Boolean, default=True, server_default=true())
 
 class Category(Base):
     __tablename__ = "categories"
@@ -27,30 +35,109 @@ class Product(Base):
     name = Column(String, index=True)
     barcode = Column(String, unique=True, index=True)
     price = Column(Float)
-    stock = Column(Integer, default=0)
+    stock = Column(Integer, default=0, server_default="0", index=True)
+    reorder_threshold = Column(Integer, nullable=False, default=10, server_default="10")
     category_id = Column(Integer, ForeignKey("categories.id"))
+    # Optimistic lock: bumped by every stock change, checked by ORM updates
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Catalog version of the last change to this row (see table_versions.stamp_products)
+    catalog_version = Column(Integer, nullable=False, default=1, server_default="1")
 
     category = relationship("Category", back_populates="products")
 
+    __mapper_args__ = {"version_id_col": version}
+    __table_args__ = (
+        # Partial index: only rows already below their own reorder point
+        Index("ix_products_below_reorder", "stock", **_partial_index("stock < reorder_threshold")),
+        # /products/changes pages through (catalog_version, id)
+        Index("ix_products_catalog_version", "catalog_version", "id"),
+    )
+
+# A deleted product, so catalog syncs (/products/changes) can drop it too
+class ProductTombstone(Base):
+    __tablename__ = "product_tombstones"
+
+    product_id = Column(Integer, primary_key=True)
+    catalog_version = Column(Integer, nullable=False, index=True)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
 class Transaction(Base):
     __tablename__ = "transactions"
 
     id = Column(Integer, primary_key=True, index=True)
     cashier_id = Column(Integer, ForeignKey("users.id"))
     total_amount = Column(Float)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now())
+    # Set by the register's offline queue (POST /transactions/batch); a resent sale is found by it
+    idempotency_key = Column(String, nullable=True)
 
     cashier = relationship("User")
-    items = relationship("TransactionItem", back_populates="transaction")
+    items = relationship("TransactionItem", back_populates="transaction", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_transactions_created_at_id", "created_at", "id"),
+        Index("ix_transactions_idempotency_key", "idempotency_key", unique=True),
+    )
 
 class TransactionItem(Base):
     __tablename__ = "transaction_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    transaction_id = Column(Integer, ForeignKey("transactions.id"))
-    product_id = Column(Integer, ForeignKey("products.id"))
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     quantity = Column(Integer)
     price_at_sale = Column(Float)
+    # The product's category when it was sold, so the rollups and their reversal
+    # stay under it after a recategorisation. No FK: history outlives categories
+    category_id = Column(Integer, nullable=True)
 
     transaction = relationship("Transaction", back_populates="items")
     product = relationship("Product")
+
+# Pre-aggregated sales, one row per bucket ("hour" or "day"). Maintained by
+# rollups.record() in the same commit as each sale, rebuilt by rollups.rebuild().
+class SalesRollup(Base):
+    __tablename__ = "sales_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    revenue = Column(Float, nullable=False, default=0, server_default="0")
+    tickets = Column(Integer, nullable=False, default=0, server_default="0")
+    units = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        UniqueConstraint("period", "bucket_start", name="uq_sales_rollups_bucket"),
+    )
+
+class ProductSalesRollup(Base):
+    __tablename__ = "product_sales_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"))
+    revenue = Column(Float, nullable=False, default=0, server_default="0")
+    tickets = Column(Integer, nullable=False, default=0, server_default="0")
+    units = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        UniqueConstraint("period", "bucket_start", "product_id", name="uq_product_sales_rollups_bucket"),
+        Index("ix_product_sales_rollups_category", "period", "bucket_start", "category_id"),
+    )
+
+# Change counters behind the list endpoints' ETags (see backend/table_versions.py)
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+# Migration history: one row per applied migration (see backend/migrations.py)
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String)
+    applied_at = Column(DateTime, default=datetime.utcnow)
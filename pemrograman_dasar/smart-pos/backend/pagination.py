@@ -0,0 +1,45 @@
+import base64
+import json
+from datetime import datetime
+
+# Keyset cursors are opaque to clients: base64 of the sort key of the last row
+# on the page. The next page starts strictly after that key, so its cost does
+# not grow with how deep the client has paged.
+
+def encode_cursor(*key):
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in key]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+def decode_id_cursor(cursor: str) -> int:
+    values = decode_cursor(cursor)
+    if not isinstance(values, list) or len(values) != 1 or not isinstance(values[0], int):
+        raise ValueError("Invalid cursor")
+    return values[0]
+
+def decode_int_cursor(cursor: str, length: int):
+    values = decode_cursor(cursor)
+    if not isinstance(values, list) or len(values) != length or not all(isinstance(v, int) for v in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+def decode_time_id_cursor(cursor: str):
+    values = decode_cursor(cursor)
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    try:
+        created_at, row_id = values
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+def set_next_cursor(response, rows, limit, key):
+    # Only a full page can have a successor
+    if rows and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(*key(rows[-1]))
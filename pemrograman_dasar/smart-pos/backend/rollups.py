@@ -0,0 +1,197 @@
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy.orm import Session
+from . import models, table_versions
+from .database import SessionLocal, dialect_insert
+
+PERIODS = ("hour", "day")
+
+def bucket_start(ts: datetime, period: str) -> datetime:
+    if period == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _upsert(db: Session, model, rows, key):
+    # Single INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x, so concurrent
+    # sales into the same bucket add up instead of overwriting each other.
+    if not rows:
+        return
+    table = model.__table__
+    stmt = dialect_insert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key,
+        set_={
+            column: table.c[column] + stmt.excluded[column]
+            for column in ("revenue", "tickets", "units")
+        },
+    )
+    db.execute(stmt, rows)
+
+def record(db: Session, created_at: datetime, lines, sign: int = 1):
+    """Add one sale to every rollup; sign=-1 takes it back out.
+
+    lines holds (product_id, category_id, quantity, price) tuples, one per product.
+    Runs inside the caller's transaction and does not commit.
+    """
+    revenue = sum(quantity * price for _, _, quantity, price in lines)
+    units = sum(quantity for _, _, quantity, _ in lines)
+    for period in PERIODS:
+        start = bucket_start(created_at, period)
+        _upsert(db, models.SalesRollup, [{
+            "period": period,
+            "bucket_start": start,
+            "revenue": sign * revenue,
+            "tickets": sign,
+            "units": sign * units,
+        }], ["period", "bucket_start"])
+        _upsert(db, models.ProductSalesRollup, [
+            {
+                "period": period,
+                "bucket_start": start,
+                "product_id": product_id,
+                "category_id": category_id,
+                "revenue": sign * quantity * price,
+                "tickets": sign,
+                "units": sign * quantity,
+            }
+            for product_id, category_id, quantity, price in lines
+        ], ["period", "bucket_start", "product_id"])
+
+def backfill_range(db: Session, first_id: int, last_id: int):
+    """Add the transactions with first_id <= id <= last_id to the rollups. Does not commit."""
+    merge(db, *_rows(*_aggregate(db, first_id, last_id)))
+
+def merge(db: Session, rows, product_rows):
+    """Add already aggregated bucket rows (same shape as rebuild() writes) to the rollups.
+
+    For bulk loaders that insert sales without going through crud. Does not commit.
+    """
+    _upsert(db, models.SalesRollup, rows, ["period", "bucket_start"])
+    _upsert(db, models.ProductSalesRollup, product_rows, ["period", "bucket_start", "product_id"])
+
+def _aggregate(db: Session, first_id=None, last_id=None):
+    # Recompute rollups from the raw tables in one streaming pass, optionally
+    # only for transactions with first_id <= id <= last_id
+    def in_range(query):
+        if first_id is not None:
+            query = query.filter(models.Transaction.id >= first_id)
+        if last_id is not None:
+            query = query.filter(models.Transaction.id <= last_id)
+        return query
+
+    totals = defaultdict(lambda: [0.0, 0, 0])
+    per_product = defaultdict(lambda: [0.0, 0, 0])
+    categories = {}
+
+    transactions = in_range(
+        db.query(models.Transaction.created_at, models.Transaction.total_amount)
+    ).execution_options(yield_per=10000)
+    for created_at, total_amount in transactions:
+        for period in PERIODS:
+            row = totals[(period, bucket_start(created_at, period))]
+            row[0] += total_amount or 0
+            row[1] += 1
+
+    items = in_range(
+        db.query(
+            models.TransactionItem.transaction_id,
+            models.Transaction.created_at,
+            models.TransactionItem.product_id,
+            models.TransactionItem.category_id,
+            models.TransactionItem.quantity,
+            models.TransactionItem.price_at_sale,
+        )
+        .join(models.Transaction, models.Transaction.id == models.TransactionItem.transaction_id)
+    ).order_by(models.TransactionItem.transaction_id).execution_options(yield_per=10000)
+    current_transaction, counted = None, set()
+    for transaction_id, created_at, product_id, category_id, quantity, price in items:
+        if transaction_id != current_transaction:
+            current_transaction, counted = transaction_id, set()
+        for period in PERIODS:
+            start = bucket_start(created_at, period)
+            totals[(period, start)][2] += quantity
+            # record() never changes a bucket row's category: the first sale's one stays
+            categories.setdefault((period, start, product_id), category_id)
+            row = per_product[(period, start, product_id)]
+            row[0] += quantity * price
+            row[2] += quantity
+            if product_id not in counted:
+                row[1] += 1
+        counted.add(product_id)
+    return totals, per_product, categories
+
+def _rows(totals, per_product, categories):
+    rows = [
+        {"period": period, "bucket_start": start, "revenue": v[0], "tickets": v[1], "units": v[2]}
+        for (period, start), v in totals.items()
+    ]
+    product_rows = [
+        {
+            "period": period, "bucket_start": start, "product_id": product_id,
+            "category_id": categories.get((period, start, product_id)),
+            "revenue": v[0], "tickets": v[1], "units": v[2],
+        }
+        for (period, start, product_id), v in per_product.items()
+    ]
+    return rows, product_rows
+
+def rebuild(db: Session, batch_size: int = 5000):
+    rows, product_rows = _rows(*_aggregate(db))
+    db.query(models.ProductSalesRollup).delete(synchronize_session=False)
+    db.query(models.SalesRollup).delete(synchronize_session=False)
+    for i in range(0, len(rows), batch_size):
+        db.execute(models.SalesRollup.__table__.insert(), rows[i:i + batch_size])
+    for i in range(0, len(product_rows), batch_size):
+        db.execute(models.ProductSalesRollup.__table__.insert(), product_rows[i:i + batch_size])
+    table_versions.bump(db, "sales_rollups")
+    db.commit()
+    return len(rows), len(product_rows)
+
+def check_consistency(db: Session, tolerance: float = 0.01):
+    """Compare stored rollups with the raw tables; returns a list of mismatches."""
+    totals, per_product, _ = _aggregate(db)
+    problems = []
+
+    def compare(label, expected, stored):
+        for key in set(expected) | set(stored):
+            want = expected.get(key, [0.0, 0, 0])
+            have = stored.get(key, [0.0, 0, 0])
+            if abs(want[0] - have[0]) > tolerance or want[1] != have[1] or want[2] != have[2]:
+                problems.append(f"{label} {key}: expected {want}, stored {have}")
+
+    stored_totals = {
+        (r.period, r.bucket_start): [r.revenue, r.tickets, r.units]
+        for r in db.query(models.SalesRollup)
+    }
+    stored_products = {
+        (r.period, r.bucket_start, r.product_id): [r.revenue, r.tickets, r.units]
+        for r in db.query(models.ProductSalesRollup)
+    }
+    compare("sales_rollups", totals, stored_totals)
+    compare("product_sales_rollups", per_product, stored_products)
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the sales rollup tables")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+
+    from .bootstrap import verify_schema
+    verify_schema()
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            buckets, product_buckets = rebuild(db)
+            print(f"Rebuilt {buckets} sales buckets and {product_buckets} product buckets.")
+        else:
+            problems = check_consistency(db)
+            for problem in problems:
+                print(problem)
+            print("Rollups are consistent." if not problems else f"{len(problems)} mismatches found.")
+            raise SystemExit(1 if problems else 0)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import async_crud, schemas, database, auth, table_versions
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+)
+
+@router.get("/summary", response_model=schemas.SalesSummary)
+async def read_sales_summary(
+    request: Request,
+    response: Response,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(database.get_read_db),
+    current_user: schemas.User = Depends(auth.get_admin_user)
+):
+    not_modified = await table_versions.not_modified(request, response, db, "sales_rollups")
+    if not_modified:
+        return not_modified
+    return await async_crud.get_sales_summary(db, start=start, end=end)
+
+@router.get("/revenue-timeseries", response_model=List[schemas.RevenuePoint])
+async def read_revenue_timeseries(
+    request: Request,
+    response: Response,
+    bucket: Literal["hour", "day"] = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(database.get_read_db),
+    current_user: schemas.User = Depends(auth.get_admin_user)
+):
+    not_modified = await table_versions.not_modified(request, response, db, "sales_rollups")
+    if not_modified:
+        return not_modified
+    return await async_crud.get_revenue_timeseries(db, bucket=bucket, start=start, end=end)
+
+@router.get("/category-sales", response_model=List[schemas.CategorySales])
+async def read_category_sales(
+    request: Request,
+    response: Response,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(database.get_read_db),
+    current_user: schemas.User = Depends(auth.get_admin_user)
+):
+    not_modified = await table_versions.not_modified(request, response, db, "sales_rollups", "categories")
+    if not_modified:
+        return not_modified
+    return await async_crud.get_category_sales(db, start=start, end=end)
@@ -1,8 +1,8 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from .. import crud, schemas, auth, database, models
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import async_crud, schemas, auth, database
 
 router = APIRouter(
     prefix="/auth",
@@ -10,9 +10,13 @@ router = APIRouter(
 )
 
 @router.post("/token", response_model=schemas.Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = crud.get_user_by_username(db, username=form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_async_db)):
+    # bcrypt runs on its own worker pool, never on the event loop
+    user = await async_crud.get_user_by_username(db, username=form_data.username)
+    # Hand the connection back first: a burst of logins would otherwise hold the
+    # whole pool while they wait for bcrypt, and checkouts queue behind them
+    await db.close()
+    if not user or not await auth.verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -25,12 +29,24 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = crud.get_user_by_username(db, username=user.username)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(database.get_async_db)):
+    db_user = await async_crud.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return crud.create_user(db=db, user=user)
+    return await async_crud.create_user(db=db, user=user)
 
 @router.get("/me", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(auth.get_current_active_user)):
+async def read_users_me(current_user: schemas.User = Depends(auth.get_current_active_user)):
     return current_user
+
+@router.put("/users/{user_id}", response_model=schemas.User)
+async def update_user(
+    user_id: int,
+    user: schemas.UserUpdate,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: schemas.User = Depends(auth.get_admin_user)
+):
+    db_user = await async_crud.update_user(db, user_id=user_id, user=user)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return db_user
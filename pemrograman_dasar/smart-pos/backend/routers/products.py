@@ -1,7 +1,8 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from .. import crud, schemas, database, auth, models
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import async_crud, schemas, database, auth, pagination, bulk, table_versions
 
 router = APIRouter(
     prefix="/products",
@@ -9,47 +10,153 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[schemas.Product])
-def read_products(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    return crud.get_products(db, skip=skip, limit=limit)
+async def read_products(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    not_modified = await table_versions.not_modified(request, response, db, "products", "categories")
+    if not_modified:
+        return not_modified
+    try:
+        products = await async_crud.get_products(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    pagination.set_next_cursor(response, products, limit, lambda p: (p.id,))
+    return products
+
+@router.get("/search", response_model=List[schemas.Product])
+async def search_products(
+    request: Request,
+    response: Response,
+    q: str,
+    limit: int = 20,
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    not_modified = await table_versions.not_modified(request, response, db, "products", "categories")
+    if not_modified:
+        return not_modified
+    return await async_crud.search_products(db, q, limit=min(limit, 100))
+
+@router.get("/changes", response_model=schemas.ProductChanges)
+async def read_product_changes(
+    response: Response,
+    since: int = 0,
+    limit: int = 1000,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    # Keep a local copy of the catalog: start with since=0, then pass the
+    # returned version as since. Follow X-Next-Cursor until it is absent.
+    limit = min(limit, 5000)
+    try:
+        version, products, deleted = await async_crud.get_product_changes(db, since=since, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    pagination.set_next_cursor(response, products, limit, lambda p: (version, p.catalog_version, p.id))
+    return {"version": version, "products": products, "deleted": deleted}
+
+@router.get("/by-barcode/{barcode}", response_model=schemas.Product)
+async def read_product_by_barcode(barcode: str, db: AsyncSession = Depends(database.get_async_db)):
+    # Primary, not a replica: a miss fills the process-wide barcode cache, and a
+    # lagging replica would park a stale row there until the next invalidation
+    product = await async_crud.get_product_by_barcode(db, barcode)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+@router.get("/low-stock", response_model=List[schemas.Product])
+async def read_low_stock_products(
+    request: Request,
+    response: Response,
+    threshold: Optional[int] = None,
+    limit: int = 100,
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    not_modified = await table_versions.not_modified(request, response, db, "products", "categories")
+    if not_modified:
+        return not_modified
+    return await async_crud.get_low_stock_products(db, threshold=threshold, limit=limit)
 
 @router.post("/", response_model=schemas.Product)
-def create_product(
+async def create_product(
     product: schemas.ProductCreate, 
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_admin_user)
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: schemas.User = Depends(auth.get_admin_user)
+):
+    return await async_crud.create_product(db=db, product=product)
+
+@router.post("/bulk", response_model=schemas.ProductImportResult)
+async def bulk_import_products(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: schemas.User = Depends(auth.get_admin_user)
 ):
-    return crud.create_product(db=db, product=product)
+    # Raw CSV (with header) or NDJSON body, read as a stream and upserted by barcode
+    if format is None:
+        format = "ndjson" if "json" in request.headers.get("content-type", "") else "csv"
+    return await bulk.import_products(db, request.stream(), format)
+
+@router.get("/export")
+async def export_products(
+    format: Literal["csv", "ndjson"] = "csv",
+    current_user: schemas.User = Depends(auth.get_admin_user)
+):
+    return StreamingResponse(
+        bulk.export_products(format),
+        media_type=bulk.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
 
 @router.delete("/{product_id}")
-def delete_product(
+async def delete_product(
     product_id: int,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_admin_user)
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: schemas.User = Depends(auth.get_admin_user)
 ):
-    deleted = crud.delete_product(db, product_id=product_id)
+    deleted = await async_crud.delete_product(db, product_id=product_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Product not found")
     return {"message": "Product deleted successfully"}
 
 @router.get("/categories/", response_model=List[schemas.Category])
-def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    return crud.get_categories(db, skip=skip, limit=limit)
+async def read_categories(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    not_modified = await table_versions.not_modified(request, response, db, "categories")
+    if not_modified:
+        return not_modified
+    try:
+        categories = await async_crud.get_categories(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    pagination.set_next_cursor(response, categories, limit, lambda c: (c.id,))
+    return categories
 
 @router.post("/categories/", response_model=schemas.Category)
-def create_category(
+async def create_category(
     category: schemas.CategoryCreate, 
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_admin_user)
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: schemas.User = Depends(auth.get_admin_user)
 ):
-    return crud.create_category(db=db, category=category)
+    return await async_crud.create_category(db=db, category=category)
 
 @router.delete("/categories/{category_id}")
-def delete_category(
+async def delete_category(
     category_id: int,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_admin_user)
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: schemas.User = Depends(auth.get_admin_user)
 ):
-    deleted = crud.delete_category(db, category_id=category_id)
+    deleted = await async_crud.delete_category(db, category_id=category_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Category not found")
     return {"message": "Category deleted successfully"}
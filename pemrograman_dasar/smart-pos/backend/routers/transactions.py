@@ -1,37 +1,91 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from .. import crud, schemas, database, auth, models
+from datetime import date, datetime
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import async_crud, schemas, database, auth, pagination, bulk, table_versions
 
 router = APIRouter(
     prefix="/transactions",
     tags=["transactions"],
 )
 
+MAX_BATCH_SIZE = 100
+
 @router.post("/", response_model=schemas.Transaction)
-def create_transaction(
+async def create_transaction(
     transaction: schemas.TransactionCreate, 
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    try:
+        return await async_crud.create_transaction(db=db, transaction=transaction, cashier_id=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/batch", response_model=List[schemas.QueuedTransactionResult])
+async def create_transactions_batch(
+    batch: schemas.TransactionBatch,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
-    return crud.create_transaction(db=db, transaction=transaction, cashier_id=current_user.id)
+    # Sales queued by a register while the backend was slow or down. Safe to send
+    # again: a key seen before answers "duplicate" with the original transaction id.
+    if len(batch.transactions) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} transactions per batch")
+    return await async_crud.create_transactions_batch(db, batch, current_user.id)
 
 @router.get("/", response_model=List[schemas.Transaction])
-def read_transactions(
+async def read_transactions(
+    request: Request,
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_read_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    # Items embed their product and category
+    not_modified = await table_versions.not_modified(request, response, db, "transactions", "products", "categories")
+    if not_modified:
+        return not_modified
+    try:
+        transactions = await async_crud.get_transactions(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    pagination.set_next_cursor(response, transactions, limit, lambda t: (t.created_at, t.id))
+    return transactions
+
+@router.get("/export")
+async def export_transactions(
+    start: Optional[Union[datetime, date]] = Query(None, alias="from"),
+    end: Optional[Union[datetime, date]] = Query(None, alias="to"),
+    format: Literal["csv", "ndjson", "parquet"] = "csv",
+    current_user: schemas.User = Depends(auth.get_admin_user)
 ):
-    return crud.get_transactions(db, skip=skip, limit=limit)
+    # Line-item level history for accounting, streamed from a server-side cursor.
+    # A plain date means midnight, so ?from=2024-01-01&to=2024-02-01 is all of January.
+    start, end = [
+        datetime.combine(value, datetime.min.time()) if type(value) is date else value
+        for value in (start, end)
+    ]
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    if format == "parquet" and not bulk.parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export needs pyarrow installed on the server")
+    return StreamingResponse(
+        bulk.export_transactions(start, end, format),
+        media_type=bulk.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'},
+    )
 
 @router.delete("/{transaction_id}")
-def delete_transaction(
+async def delete_transaction(
     transaction_id: int,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
-    transaction = crud.delete_transaction(db=db, transaction_id=transaction_id)
+    transaction = await async_crud.delete_transaction(db=db, transaction_id=transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return {"message": "Transaction deleted successfully"}
@@ -1,5 +1,5 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from pydantic import BaseModel, constr
 from datetime import datetime
 
 # Token
@@ -18,6 +18,10 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
 
+class UserUpdate(BaseModel):
+    role: Optional[str] = None
+    is_active: Optional[bool] = None
+
 class User(UserBase):
     id: int
     is_active: bool
@@ -45,6 +49,7 @@ class ProductBase(BaseModel):
     price: float
     stock: int
     category_id: int
+    reorder_threshold: int = 10
 
 class ProductCreate(ProductBase):
     pass
@@ -56,6 +61,32 @@ class Product(ProductBase):
     class Config:
         orm_mode = True
 
+# Delta feed: products changed and ids deleted since the client's catalog version
+class ProductChanges(BaseModel):
+    version: int
+    products: List[Product]
+    deleted: List[int]
+
+# Bulk import: one CSV/NDJSON row. The category is given by id or by name.
+class ProductImportRow(BaseModel):
+    name: str
+    barcode: str
+    price: float
+    stock: int = 0
+    reorder_threshold: int = 10
+    category_id: Optional[int] = None
+    category: Optional[str] = None
+
+class ProductImportError(BaseModel):
+    line: int
+    error: str
+
+class ProductImportResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ProductImportError] = []
+
 # TransactionItem
 class TransactionItemBase(BaseModel):
     product_id: int
@@ -76,6 +107,21 @@ class TransactionItem(TransactionItemBase):
 class TransactionCreate(BaseModel):
     items: List[TransactionItemCreate]
 
+# Offline register queue: the key is made by the register, so sending a sale
+# again (after a timeout, or a crash before the reply) never records it twice
+class QueuedTransaction(TransactionCreate):
+    idempotency_key: constr(min_length=1, max_length=64)
+    created_at: Optional[datetime] = None  # when the sale was rung up, in UTC
+
+class TransactionBatch(BaseModel):
+    transactions: List[QueuedTransaction]
+
+class QueuedTransactionResult(BaseModel):
+    idempotency_key: str
+    status: Literal["created", "duplicate", "rejected"]
+    transaction_id: Optional[int] = None
+    error: Optional[str] = None
+
 class Transaction(BaseModel):
     id: int
     cashier_id: int
@@ -86,3 +132,20 @@ class Transaction(BaseModel):
 
     class Config:
         orm_mode = True
+
+# Analytics
+class SalesSummary(BaseModel):
+    transaction_count: int
+    total_revenue: float
+    average_order: float
+
+class RevenuePoint(BaseModel):
+    bucket: datetime
+    revenue: float
+    transactions: int
+
+class CategorySales(BaseModel):
+    category_id: Optional[int] = None
+    category: str
+    revenue: float
+    units: int
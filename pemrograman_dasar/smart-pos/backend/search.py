@@ -0,0 +1,82 @@
+import re
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session, joinedload
+from . import models
+
+# Product search runs on an SQLite FTS5 index over name and barcode. It is an
+# external-content table (no copy of the rows), kept in sync by triggers on
+# products, so every write path - crud, bulk loads, raw SQL - updates it.
+FTS_TABLE = "products_fts"
+
+FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, barcode, content='products', content_rowid='id', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, barcode) VALUES (new.id, new.name, new.barcode);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, barcode) VALUES ('delete', old.id, old.name, old.barcode);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, barcode ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, barcode) VALUES ('delete', old.id, old.name, old.barcode);
+        INSERT INTO {FTS_TABLE}(rowid, name, barcode) VALUES (new.id, new.name, new.barcode);
+    END""",
+]
+
+def fts_available(db_or_engine) -> bool:
+    bind = db_or_engine.get_bind() if isinstance(db_or_engine, Session) else db_or_engine
+    return bind.dialect.name == "sqlite"
+
+def ensure_index(engine):
+    if not fts_available(engine):
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        ).first()
+        for ddl in FTS_DDL:
+            conn.execute(text(ddl))
+        if not exists:
+            # First time on an existing catalog: index the rows already there
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+def _match_expression(q: str):
+    # Every word must match as a prefix; quoting keeps FTS5 syntax out of user input
+    tokens = re.findall(r"\w+", q)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def search_products(db: Session, q: str, limit: int = 20):
+    match = _match_expression(q)
+    if not match:
+        return []
+    if fts_available(db):
+        ids = [
+            row[0]
+            for row in db.execute(
+                text(
+                    f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+                    f"ORDER BY bm25({FTS_TABLE}, 1.0, 2.0) LIMIT :limit"
+                ),
+                {"match": match, "limit": limit},
+            )
+        ]
+    else:
+        pattern = f"%{q.strip()}%"
+        ids = [
+            row[0]
+            for row in db.query(models.Product.id)
+            .filter(or_(models.Product.name.ilike(pattern), models.Product.barcode.like(f"{q.strip()}%")))
+            .order_by(models.Product.name)
+            .limit(limit)
+        ]
+    if not ids:
+        return []
+    products = {
+        p.id: p
+        for p in db.query(models.Product)
+        .options(joinedload(models.Product.category))
+        .filter(models.Product.id.in_(ids))
+    }
+    return [products[i] for i in ids if i in products]
@@ -1,133 +1,248 @@
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, select, text
 from sqlalchemy.orm import Session
-from backend.database import SessionLocal, engine
-from backend import models
-from datetime import datetime, timedelta
-import random
+from backend.database import SessionLocal, dialect_insert
+from backend import models, rollups, bootstrap, table_versions
+from backend.auth import get_password_hash
 
-# Ensure tables exist
-models.Base.metadata.create_all(bind=engine)
+# Synthetic data generator for demos and benchmarks:
+#   python -m backend.seed_data --transactions 1000000 --days 365 --stores 5 --skus 2000
+# Baskets, timestamps and totals are drawn with NumPy in chunks and written with
+# executemany inserts, one commit per chunk. Runs are additive: the catalog and
+# cashier accounts are upserted, transactions are appended. Transaction ids are
+# allocated from max(id), so run it while the backend is not taking sales.
 
-def seed_data():
-    db = SessionLocal()
-    
-    # 1. Categories
-    categories = ["Makanan Ringan", "Minuman Dingin", "Kopi", "Alat Tulis", "Sembako"]
-    db_cats = []
-    print("Creating Categories...")
-    for cat_name in categories:
-        existing = db.query(models.Category).filter(models.Category.name == cat_name).first()
-        if not existing:
-            cat = models.Category(name=cat_name)
-            db.add(cat)
-            db_cats.append(cat)
-        else:
-            db_cats.append(existing)
+CATEGORIES = ["Makanan Ringan", "Minuman Dingin", "Kopi", "Alat Tulis", "Sembako"]
+
+PRODUCTS = [
+    {"name": "Chitato Sapi Panggang", "barcode": "899123456", "price": 12000, "stock": 50, "cat": "Makanan Ringan"},
+    {"name": "Oreo Vanilla", "barcode": "899123457", "price": 8500, "stock": 40, "cat": "Makanan Ringan"},
+    {"name": "Teh Pucuk Harum", "barcode": "899123458", "price": 4000, "stock": 100, "cat": "Minuman Dingin"},
+    {"name": "Aqua 600ml", "barcode": "899123459", "price": 3500, "stock": 120, "cat": "Minuman Dingin"},
+    {"name": "Kopi Kapal Api", "barcode": "899123460", "price": 2500, "stock": 200, "cat": "Kopi"},
+    {"name": "Indomie Goreng", "barcode": "899123461", "price": 3500, "stock": 150, "cat": "Sembako"},
+    {"name": "Buku Sidu 38 Lembar", "barcode": "899123462", "price": 5000, "stock": 80, "cat": "Alat Tulis"},
+    {"name": "Pulpen Pilot", "barcode": "899123463", "price": 3000, "stock": 60, "cat": "Alat Tulis"},
+    {"name": "Minyak Goreng 2L", "barcode": "899123464", "price": 35000, "stock": 20, "cat": "Sembako"},
+    {"name": "Susu UHT Full Cream", "barcode": "899123465", "price": 18000, "stock": 30, "cat": "Minuman Dingin"},
+    # Produk tambahan 11-20
+    {"name": "Lays Rumput Laut", "barcode": "899123466", "price": 13000, "stock": 45, "cat": "Makanan Ringan"},
+    {"name": "Pocari Sweat 500ml", "barcode": "899123467", "price": 7000, "stock": 90, "cat": "Minuman Dingin"},
+    {"name": "Good Day Cappuccino", "barcode": "899123468", "price": 2000, "stock": 180, "cat": "Kopi"},
+    {"name": "Beras 5kg", "barcode": "899123469", "price": 65000, "stock": 15, "cat": "Sembako"},
+    {"name": "Pensil 2B Faber Castell", "barcode": "899123470", "price": 2500, "stock": 100, "cat": "Alat Tulis"},
+    {"name": "Tango Wafer Coklat", "barcode": "899123471", "price": 6000, "stock": 55, "cat": "Makanan Ringan"},
+    {"name": "Coca Cola 330ml", "barcode": "899123472", "price": 5500, "stock": 110, "cat": "Minuman Dingin"},
+    {"name": "Nescafe Classic", "barcode": "899123473", "price": 1500, "stock": 220, "cat": "Kopi"},
+    {"name": "Gula Pasir 1kg", "barcode": "899123474", "price": 15000, "stock": 35, "cat": "Sembako"},
+    {"name": "Penghapus Karet Joyko", "barcode": "899123475", "price": 1500, "stock": 75, "cat": "Alat Tulis"},
+]
+
+CASHIER_PASSWORD = "kasir123"
+
+# Relative traffic: Monday..Sunday, hour of day (store open 07-22), and a boost
+# around payday (25th to 3rd of the month)
+WEEKDAY_WEIGHTS = np.array([1.0, 0.95, 0.95, 1.0, 1.15, 1.35, 1.3])
+HOUR_WEIGHTS = np.array([
+    0, 0, 0, 0, 0, 0, 0, 0.4, 0.9, 0.8, 0.7, 0.9,
+    1.3, 1.1, 0.7, 0.7, 0.9, 1.2, 1.5, 1.4, 1.1, 0.8, 0.4, 0,
+])
+PAYDAY_BOOST = 1.2
+
+def _upsert_catalog(db: Session, skus: int, rng):
+    db.execute(
+        dialect_insert(db, models.Category.__table__).on_conflict_do_nothing(index_elements=["name"]),
+        [{"name": name} for name in CATEGORIES],
+    )
+    category_ids = dict(db.execute(
+        select(models.Category.name, models.Category.id).where(models.Category.name.in_(CATEGORIES))
+    ).all())
+
+    rows = [
+        {"name": p["name"], "barcode": p["barcode"], "price": p["price"], "stock": p["stock"],
+         "category_id": category_ids[p["cat"]]}
+        for p in PRODUCTS[:skus]
+    ]
+    extra = max(skus - len(PRODUCTS), 0)
+    if extra:
+        # Log-normal prices rounded to Rp 500, like a real minimarket price list
+        prices = np.maximum(np.round(rng.lognormal(np.log(8000), 0.8, extra) / 500) * 500, 500)
+        stocks = rng.integers(20, 300, extra)
+        for i, (price, stock) in enumerate(zip(prices.tolist(), stocks.tolist()), start=1):
+            category = CATEGORIES[i % len(CATEGORIES)]
+            rows.append({
+                "name": f"{category} #{i}", "barcode": f"SYN{i:09d}", "price": price, "stock": stock,
+                "category_id": category_ids[category],
+            })
+    last_id = db.scalar(select(func.max(models.Product.id))) or 0
+    for i in range(0, len(rows), 5000):
+        db.execute(
+            dialect_insert(db, models.Product.__table__).on_conflict_do_nothing(index_elements=["barcode"]),
+            rows[i:i + 5000],
+        )
+    table_versions.stamp_products(db, models.Product.id > last_id, "categories")
     db.commit()
 
-    # Refresh to get IDs
-    for cat in db_cats:
-        db.refresh(cat)
-
-    # 2. Products
-    products_data = [
-        {"name": "Chitato Sapi Panggang", "barcode": "899123456", "price": 12000, "stock": 50, "cat": "Makanan Ringan"},
-        {"name": "Oreo Vanilla", "barcode": "899123457", "price": 8500, "stock": 40, "cat": "Makanan Ringan"},
-        {"name": "Teh Pucuk Harum", "barcode": "899123458", "price": 4000, "stock": 100, "cat": "Minuman Dingin"},
-        {"name": "Aqua 600ml", "barcode": "899123459", "price": 3500, "stock": 120, "cat": "Minuman Dingan"},
-        {"name": "Kopi Kapal Api", "barcode": "899123460", "price": 2500, "stock": 200, "cat": "Kopi"},
-        {"name": "Indomie Goreng", "barcode": "899123461", "price": 3500, "stock": 150, "cat": "Sembako"},
-        {"name": "Buku Sidu 38 Lembar", "barcode": "899123462", "price": 5000, "stock": 80, "cat": "Alat Tulis"},
-        {"name": "Pulpen Pilot", "barcode": "899123463", "price": 3000, "stock": 60, "cat": "Alat Tulis"},
-        {"name": "Minyak Goreng 2L", "barcode": "899123464", "price": 35000, "stock": 20, "cat": "Sembako"},
-        {"name": "Susu UHT Full Cream", "barcode": "899123465", "price": 18000, "stock": 30, "cat": "Minuman Dingin"},
-        # Produk tambahan 11-20
-        {"name": "Lays Rumput Laut", "barcode": "899123466", "price": 13000, "stock": 45, "cat": "Makanan Ringan"},
-        {"name": "Pocari Sweat 500ml", "barcode": "899123467", "price": 7000, "stock": 90, "cat": "Minuman Dingin"},
-        {"name": "Good Day Cappuccino", "barcode": "899123468", "price": 2000, "stock": 180, "cat": "Kopi"},
-        {"name": "Beras 5kg", "barcode": "899123469", "price": 65000, "stock": 15, "cat": "Sembako"},
-        {"name": "Pensil 2B Faber Castell", "barcode": "899123470", "price": 2500, "stock": 100, "cat": "Alat Tulis"},
-        {"name": "Tango Wafer Coklat", "barcode": "899123471", "price": 6000, "stock": 55, "cat": "Makanan Ringan"},
-        {"name": "Coca Cola 330ml", "barcode": "899123472", "price": 5500, "stock": 110, "cat": "Minuman Dingin"},
-        {"name": "Nescafe Classic", "barcode": "899123473", "price": 1500, "stock": 220, "cat": "Kopi"},
-        {"name": "Gula Pasir 1kg", "barcode": "899123474", "price": 15000, "stock": 35, "cat": "Sembako"},
-        {"name": "Penghapus Karet Joyko", "barcode": "899123475", "price": 1500, "stock": 75, "cat": "Alat Tulis"},
+    wanted = {row["barcode"] for row in rows}
+    catalog = [
+        row for row in db.execute(
+            select(models.Product.id, models.Product.price, models.Product.category_id, models.Product.barcode)
+            .order_by(models.Product.id)
+        )
+        if row.barcode in wanted
     ]
+    return (
+        np.array([row.id for row in catalog], dtype=np.int64),
+        np.array([row.price for row in catalog], dtype=np.float64),
+        [row.category_id for row in catalog],
+    )
 
-    print("Creating Products...")
-    db_products = []
-    for p in products_data:
-        existing = db.query(models.Product).filter(models.Product.barcode == p["barcode"]).first()
-        
-        # Find category ID
-        cat_id = next((c.id for c in db_cats if c.name == p["cat"]), None)
-        
-        if not existing and cat_id:
-            prod = models.Product(
-                name=p["name"],
-                barcode=p["barcode"],
-                price=p["price"],
-                stock=p["stock"],
-                category_id=cat_id
-            )
-            db.add(prod)
-            db_products.append(prod)
-        elif existing:
-            db_products.append(existing)
-            
+def _upsert_cashiers(db: Session, stores: int):
+    # One cashier account per store; bcrypt once and reuse the hash
+    usernames = [f"kasir{i}" for i in range(1, stores + 1)]
+    hashed = get_password_hash(CASHIER_PASSWORD)
+    db.execute(
+        dialect_insert(db, models.User.__table__).on_conflict_do_nothing(index_elements=["username"]),
+        [{"username": name, "hashed_password": hashed, "role": "cashier", "is_active": True} for name in usernames],
+    )
     db.commit()
-    
-    # Refresh Products
-    for prod in db_products:
-        db.refresh(prod)
-
-    # 3. Dummy Transactions (Past 7 days)
-    print("Creating Dummy Transactions...")
-    
-    # Get Admin User ID for cashier
-    admin = db.query(models.User).filter(models.User.username == "admin").first()
-    if not admin:
-        print("Please restart backend first to create admin user.")
-        return
-
-    for i in range(20):
-        # Random date within last 7 days
-        days_ago = random.randint(0, 7)
-        txn_date = datetime.utcnow() - timedelta(days=days_ago, hours=random.randint(0, 12))
-        
-        txn = models.Transaction(
-            cashier_id=admin.id,
-            total_amount=0,
-            created_at=txn_date
-        )
-        db.add(txn)
-        db.commit()
-        db.refresh(txn)
-        
-        # Add random items
-        total = 0
-        num_items = random.randint(1, 4)
-        selected_products = random.sample(db_products, num_items)
-        
-        for prod in selected_products:
-            qty = random.randint(1, 3)
-            price = prod.price
-            total += price * qty
-            
-            item = models.TransactionItem(
-                transaction_id=txn.id,
-                product_id=prod.id,
-                quantity=qty,
-                price_at_sale=price
-            )
-            db.add(item)
-            
-            # Reduce stock if we cared about logic here but this is dummy data
-            
-        txn.total_amount = total
-        db.commit()
-
-    db.close()
+    ids = dict(db.execute(select(models.User.username, models.User.id).where(models.User.username.in_(usernames))).all())
+    return np.array([ids[name] for name in usernames], dtype=np.int64)
+
+def _timestamps(n: int, days: int, end: datetime, rng):
+    """n sorted sale times over the `days` days before `end` (midnight), as datetime64[s]."""
+    start = np.datetime64(end.date(), "D") - days
+    dates = start + np.arange(days)
+    weekday = (dates.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    day_of_month = (dates - dates.astype("datetime64[M]")).astype(np.int64) + 1
+    day_of_year = (dates - dates.astype("datetime64[Y]")).astype(np.int64)
+    weights = (
+        WEEKDAY_WEIGHTS[weekday]
+        * np.where((day_of_month >= 25) | (day_of_month <= 3), PAYDAY_BOOST, 1.0)
+        * (1 + 0.15 * np.cos(2 * np.pi * (day_of_year - 355) / 365.25))  # year-end peak
+        * np.linspace(0.85, 1.0, days)  # slow growth over the window
+    )
+    day = rng.choice(days, size=n, p=weights / weights.sum())
+    hour = rng.choice(24, size=n, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    seconds = day * 86400 + hour * 3600 + rng.integers(0, 3600, size=n)
+    seconds.sort()
+    return start.astype("datetime64[s]") + seconds
+
+def _rollup_rows(created, line_txn, product_index, quantity, line_total, totals, product_ids, category_ids):
+    rows, product_rows = [], []
+    n_sku = len(product_ids)
+    for period, size in (("hour", 3600), ("day", 86400)):
+        bucket = created.astype(np.int64) // size * size
+        starts, txn_bucket = np.unique(bucket, return_inverse=True)
+        start_times = starts.astype("datetime64[s]").tolist()
+        revenue = np.bincount(txn_bucket, weights=totals)
+        tickets = np.bincount(txn_bucket)
+        units = np.bincount(txn_bucket[line_txn], weights=quantity, minlength=len(starts))
+        for start, r, t, u in zip(start_times, revenue.tolist(), tickets.tolist(), units.tolist()):
+            rows.append({"period": period, "bucket_start": start, "revenue": r, "tickets": t, "units": int(u)})
+
+        keys, line_key = np.unique(txn_bucket[line_txn] * n_sku + product_index, return_inverse=True)
+        revenue = np.bincount(line_key, weights=line_total)
+        tickets = np.bincount(line_key)  # one line per product per sale
+        units = np.bincount(line_key, weights=quantity)
+        for key, r, t, u in zip(keys.tolist(), revenue.tolist(), tickets.tolist(), units.tolist()):
+            index = key % n_sku
+            product_rows.append({
+                "period": period, "bucket_start": start_times[key // n_sku],
+                "product_id": int(product_ids[index]), "category_id": category_ids[index],
+                "revenue": r, "tickets": t, "units": int(u),
+            })
+    return rows, product_rows
+
+def seed_data(transactions: int = 500, days: int = 30, stores: int = 2, skus: int = len(PRODUCTS),
+              basket_mean: float = 2.5, chunk_size: int = 50000, seed=None):
+    bootstrap.verify_schema()
+    rng = np.random.default_rng(seed)
+    db = SessionLocal()
+    try:
+        print("Creating catalog...")
+        product_ids, prices, category_ids = _upsert_catalog(db, skus, rng)
+        cashier_ids = _upsert_cashiers(db, stores)
+        n_sku = len(product_ids)
+        if not transactions or not n_sku:
+            return 0
+
+        # Zipf-ish popularity over a shuffled catalog; some stores are busier than others
+        popularity = 1.0 / np.arange(1, n_sku + 1) ** 1.07
+        popularity = rng.permutation(popularity / popularity.sum())
+        store_weights = rng.dirichlet(np.full(stores, 4.0))
+
+        created_all = _timestamps(transactions, days, datetime.utcnow(), rng)
+        transaction_table = models.Transaction.__table__
+        item_table = models.TransactionItem.__table__
+        next_id = (db.scalar(select(func.max(transaction_table.c.id))) or 0) + 1
+
+        print(f"Creating {transactions} transactions...")
+        started = time.perf_counter()
+        for offset in range(0, transactions, chunk_size):
+            created = created_all[offset:offset + chunk_size]
+            m = len(created)
+
+            # Basket: 1 + Poisson lines, products by popularity, repeated picks merged
+            sizes = np.minimum(1 + rng.poisson(basket_mean - 1, m), 12)
+            line_txn = np.repeat(np.arange(m), sizes)
+            picks = rng.choice(n_sku, size=len(line_txn), p=popularity)
+            keys, inverse = np.unique(line_txn * n_sku + picks, return_inverse=True)
+            quantity = np.bincount(inverse, weights=np.minimum(rng.geometric(0.6, len(line_txn)), 10)).astype(np.int64)
+            line_txn, product_index = keys // n_sku, keys % n_sku
+            line_total = quantity * prices[product_index]
+            totals = np.bincount(line_txn, weights=line_total, minlength=m)
+            cashiers = cashier_ids[rng.choice(stores, size=m, p=store_weights)]
+
+            ids = np.arange(next_id, next_id + m, dtype=np.int64)
+            next_id += m
+            db.execute(transaction_table.insert(), [
+                {"id": i, "cashier_id": c, "total_amount": t, "created_at": ts}
+                for i, c, t, ts in zip(ids.tolist(), cashiers.tolist(), totals.tolist(), created.tolist())
+            ])
+            db.execute(item_table.insert(), [
+                {"transaction_id": t, "product_id": p, "category_id": category_ids[i], "quantity": q, "price_at_sale": price}
+                for t, p, i, q, price in zip(
+                    ids[line_txn].tolist(), product_ids[product_index].tolist(), product_index.tolist(),
+                    quantity.tolist(), prices[product_index].tolist(),
+                )
+            ])
+            # Generated sales bypass crud, so add them to the rollups here
+            rollups.merge(db, *_rollup_rows(
+                created, line_txn, product_index, quantity, line_total, totals, product_ids, category_ids
+            ))
+            table_versions.bump(db, "sales_rollups", "transactions")
+            db.commit()
+            done = offset + m
+            rate = done / (time.perf_counter() - started)
+            print(f"  {done}/{transactions} transactions ({rate:,.0f}/s)")
+        if db.get_bind().dialect.name == "postgresql":
+            # Explicit ids do not advance the SERIAL sequence
+            db.execute(text("SELECT setval(pg_get_serial_sequence('transactions', 'id'), (SELECT MAX(id) FROM transactions))"))
+            db.commit()
+        return transactions
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Smart POS data")
+    parser.add_argument("--transactions", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30, help="spread sales over this many past days")
+    parser.add_argument("--stores", type=int, default=2, help="stores, one cashier account (kasirN) each")
+    parser.add_argument("--skus", type=int, default=len(PRODUCTS), help="catalog size; beyond the built-in list products are synthetic")
+    parser.add_argument("--basket-mean", type=float, default=2.5, help="average lines per transaction")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="transactions per insert batch / commit")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible data")
+    args = parser.parse_args(argv)
+    seed_data(
+        transactions=args.transactions, days=args.days, stores=args.stores, skus=args.skus,
+        basket_mean=args.basket_mean, chunk_size=args.chunk_size, seed=args.seed,
+    )
     print("Data Seeding Complete!")
 
 if __name__ == "__main__":
-    seed_data()
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Cold-start report for the API, in the spirit of `python -X importtime`:
+#   python -m backend.startup_report [--runs 3] [--top 15] [--budget 1.0]
+# Every measurement runs in a fresh interpreter, against the database the API
+# would use from the current directory, so it needs a bootstrapped schema.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_PROBE = """
+import asyncio, sys, time
+t0 = time.perf_counter()
+from backend.main import app
+t1 = time.perf_counter()
+
+async def run():
+    async with app.router.lifespan_context(app):
+        pass
+
+asyncio.run(run())
+t2 = time.perf_counter()
+sys.stderr.write(f"startup-probe {t1 - t0:.6f} {t2 - t1:.6f}\\n")
+"""
+
+def _python(*args):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_ROOT, os.environ.get("PYTHONPATH")])))
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, env=env, check=True)
+
+def measure_startup(runs: int):
+    """Best-of-`runs` (import seconds, startup seconds) for backend.main."""
+    samples = []
+    for _ in range(runs):
+        # One write to stderr: the app prints to stdout from its own threads (the
+        # barcode cache warm-up), which could land in the middle of a print()
+        found = re.search(r"startup-probe ([\d.]+) ([\d.]+)", _python("-c", STARTUP_PROBE).stderr)
+        samples.append((float(found.group(1)), float(found.group(2))))
+    return min(samples, key=sum)
+
+def import_times():
+    """(self us, cumulative us, depth, module) per line of -X importtime output."""
+    rows = []
+    for line in _python("-X", "importtime", "-c", "import backend.main").stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report Smart POS API import and startup time")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to try; the best is reported")
+    parser.add_argument("--top", type=int, default=15, help="rows to show per import table")
+    parser.add_argument("--budget", type=float, default=None, help="exit 1 if import + startup exceeds this many seconds")
+    args = parser.parse_args(argv)
+
+    rows = import_times()
+    print("Imports made by backend.main (cumulative ms)")
+    for _, cumulative, _, name in sorted((r for r in rows if r[2] == 1), key=lambda r: -r[1])[:args.top]:
+        print(f"  {cumulative / 1000:9.1f}  {name}")
+    print("Slowest modules on their own (self ms)")
+    for self_us, _, _, name in sorted(rows, key=lambda r: -r[0])[:args.top]:
+        print(f"  {self_us / 1000:9.1f}  {name}")
+
+    import_s, startup_s = measure_startup(args.runs)
+    total = import_s + startup_s
+    print(f"import backend.main: {import_s * 1000:.0f} ms")
+    print(f"startup events:      {startup_s * 1000:.0f} ms")
+    print(f"cold start total:    {total * 1000:.0f} ms (best of {args.runs})")
+    if args.budget is not None and total > args.budget:
+        print(f"Over budget ({args.budget * 1000:.0f} ms)")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import asyncio
+import random
+import time
+from sqlalchemy import case, update
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from . import models
+
+# Conflicts (a stale product version, SQLite's "database is locked" or a PostgreSQL
+# serialization failure/deadlock) are retried this many times with jittered exponential backoff before giving up.
+MAX_RETRIES = 8
+RETRY_BASE_DELAY = 0.005
+RETRYABLE_PGCODES = ("40001", "40P01")
+
+class InsufficientStock(ValueError):
+    def __init__(self, names):
+        self.names = names
+        super().__init__(f"Insufficient stock: {', '.join(names)}")
+
+def _is_conflict(error):
+    if isinstance(error, StaleDataError):
+        return True
+    if not isinstance(error, DBAPIError):
+        return False
+    # Decided by SQLSTATE: psycopg2 raises deadlocks as OperationalError, but
+    # asyncpg's adapter raises them (and serialization failures) as plain DBAPIError
+    if getattr(error.orig, "pgcode", None) in RETRYABLE_PGCODES:
+        return True
+    return isinstance(error, OperationalError) and "locked" in str(error.orig).lower()
+
+def _dialect(db: Session):
+    return db.get_bind().dialect
+
+def lock_products(db: Session, product_ids):
+    """Fetch the cart's products in one query, row-locked where the backend can.
+
+    On PostgreSQL the rows are taken with FOR UPDATE in id order. Every checkout
+    locks in the same order, so two carts that share products queue behind each
+    other instead of deadlocking.
+    """
+    query = db.query(models.Product).filter(models.Product.id.in_(product_ids))
+    if _dialect(db).name != "postgresql":
+        return {p.id: p for p in query.all()}
+    return {p.id: p for p in query.order_by(models.Product.id).with_for_update(of=models.Product)}
+
+def _backoff(attempt):
+    return RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+def run_with_retry(db: Session, operation):
+    """Run operation() and retry it from scratch when it loses a write conflict.
+
+    operation must do its own reads, writes and commit, so a retry sees fresh rows.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return operation()
+        except (DBAPIError, StaleDataError) as e:
+            db.rollback()
+            if attempt == MAX_RETRIES or not _is_conflict(e):
+                raise
+            time.sleep(_backoff(attempt))
+
+async def run_with_retry_async(db, operation, *args):
+    """run_with_retry for an AsyncSession: operation(sync_session, *args) runs via
+    run_sync, and the backoff awaits instead of blocking the event loop."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return await db.run_sync(operation, *args)
+        except (DBAPIError, StaleDataError) as e:
+            await db.rollback()
+            if attempt == MAX_RETRIES or not _is_conflict(e):
+                raise
+            await asyncio.sleep(_backoff(attempt))
+
+def reserve(db: Session, quantities: dict, products: dict):
+    """Decrement stock for {product_id: quantity} in one conditional UPDATE.
+
+    Every row is guarded by stock >= quantity and gets its version bumped, so the
+    change is atomic in the database and concurrent ORM writers see it as a conflict.
+    Raises InsufficientStock (after rolling back) if any line cannot be covered.
+    """
+    wanted = case(quantities, value=models.Product.id)
+    stmt = (
+        update(models.Product)
+        .where(models.Product.id.in_(quantities), models.Product.stock >= wanted)
+        .values(stock=models.Product.stock - wanted, version=models.Product.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if getattr(_dialect(db), "update_returning", False):
+        # RETURNING tells us exactly which rows were covered, no rowcount guessing
+        updated = len(db.execute(stmt.returning(models.Product.id)).all())
+    else:
+        updated = db.execute(stmt).rowcount
+    if updated != len(quantities):
+        db.rollback()
+        current = dict(
+            db.query(models.Product.id, models.Product.stock)
+            .filter(models.Product.id.in_(quantities))
+            .all()
+        )
+        short = [
+            products[product_id].name
+            for product_id, quantity in quantities.items()
+            if current.get(product_id, 0) < quantity
+        ]
+        raise InsufficientStock(short or ["stock changed, please retry"])
+
+def adjust(db: Session, product_id: int, delta: int):
+    """Atomically add delta to one product's stock; never lets it go below zero."""
+    query = db.query(models.Product).filter(models.Product.id == product_id)
+    if delta < 0:
+        query = query.filter(models.Product.stock >= -delta)
+    return query.update(
+        {
+            models.Product.stock: models.Product.stock + delta,
+            models.Product.version: models.Product.version + 1,
+        },
+        synchronize_session=False
+    )
@@ -0,0 +1,66 @@
+from typing import Dict, Optional
+from fastapi import Request, Response
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from . import models
+
+# One counter per table, bumped in the same commit as every write to it. List
+# endpoints turn the counters they depend on into a weak ETag, so a client that
+# already has the current body gets a 304 after a primary-key lookup instead of
+# the full query. Writers bump last, right before commit, in name order: the
+# counter row is a per-table lock, held only for the commit itself.
+#
+# The products counter doubles as the catalog version behind /products/changes:
+# every changed product row is stamped with it (products.catalog_version) and
+# every deleted one leaves a tombstone. Row locks are always taken product rows
+# first, counter second, so stamps are handed out in commit order.
+TRACKED = ("categories", "products", "sales_rollups", "transactions")
+
+def bump(db: Session, *tables: str) -> Dict[str, int]:
+    """Increment the counters for tables; returns their new values."""
+    table = models.TableVersion.__table__
+    versions = {}
+    for name in sorted(set(tables)):
+        stmt = update(table).where(table.c.name == name).values(version=table.c.version + 1)
+        if getattr(db.get_bind().dialect, "update_returning", False):
+            versions[name] = db.execute(stmt.returning(table.c.version)).scalar()
+        else:
+            db.execute(stmt)
+            versions[name] = current(db, name)
+    return versions
+
+def stamp_products(db: Session, where, *tables: str) -> int:
+    """bump() products (plus tables) and stamp the products matching where with the new catalog version."""
+    version = bump(db, "products", *tables)["products"]
+    db.execute(update(models.Product.__table__).where(where).values(catalog_version=version))
+    return version
+
+def current(db: Session, name: str) -> int:
+    return db.scalar(select(models.TableVersion.version).where(models.TableVersion.name == name)) or 0
+
+async def etag(db: AsyncSession, *tables: str) -> Optional[str]:
+    rows = dict((await db.execute(
+        select(models.TableVersion.name, models.TableVersion.version).where(models.TableVersion.name.in_(tables))
+    )).all())
+    if len(rows) != len(set(tables)):
+        return None  # a counter row is missing: never claim "not modified"
+    return 'W/"' + "-".join(str(rows[name]) for name in tables) + '"'
+
+def _matches(if_none_match: str, current: str) -> bool:
+    # Weak comparison (RFC 9110 13.1.2): the W/ prefix is ignored on both sides
+    if if_none_match.strip() == "*":
+        return True
+    opaque = current.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+async def not_modified(request: Request, response: Response, db: AsyncSession, *tables: str) -> Optional[Response]:
+    """Set ETag on response; return a 304 to send instead if the client's copy is current."""
+    current = await etag(db, *tables)
+    if current is None:
+        return None
+    headers = {"ETag": current, "Cache-Control": "no-cache"}
+    if _matches(request.headers.get("If-None-Match", ""), current):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
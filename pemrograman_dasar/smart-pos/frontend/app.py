@@ -41,6 +41,10 @@ def start_backend():
         print("Backend belum jalan, gaspol nyalain sekarang...")
         
         try:
+            # Database baru / schema lama: bootstrap sekali, abis itu startup cuma ngecek versi
+            from backend import bootstrap
+            if bootstrap.current_version() != bootstrap.SCHEMA_VERSION:
+                bootstrap.bootstrap()
             from backend.main import app as backend_app
         except ImportError as e:
             st.error(f"Gagal import backend: {e}")
@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from datetime import datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
 from utils import api_request, load_css, render_sidebar
@@ -19,13 +20,19 @@ if "role" not in st.session_state or st.session_state.role != "admin":
 st.title("📈 Executive Dashboard")
 st.markdown("<p style='color: #9ca3af; margin-top: -10px;'>Pantau semua statistik bisnis di sini</p>", unsafe_allow_html=True)
 
-# Tarik data transaksi dari API
-transactions = api_request("GET", "/transactions/")
+# Pilih rentang waktu, agregasinya dihitung di backend (SQL) biar ga narik semua transaksi
+period = st.selectbox("Rentang Waktu", ["Semua", "7 Hari Terakhir", "30 Hari Terakhir"], key="dashboard_period")
+# Backend ngebuletin start ke awal jam, jadi dibuletin di sini juga biar key cache-nya sama sepanjang jam
+this_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+period_params = {}
+if period == "7 Hari Terakhir":
+    period_params["start"] = (this_hour - timedelta(days=7)).isoformat()
+elif period == "30 Hari Terakhir":
+    period_params["start"] = (this_hour - timedelta(days=30)).isoformat()
 
-if transactions:
-    t_df = pd.DataFrame(transactions)
-    t_df['created_at'] = pd.to_datetime(t_df['created_at'])
-    
+summary = api_request("GET", "/analytics/summary", params=period_params)
+
+if summary and summary['transaction_count'] > 0:
     # --- KPI Utama (Kartu-kartu di atas) ---
     st.markdown("<div style='height: 12px;'></div>", unsafe_allow_html=True)
     c1, c2, c3, c4 = st.columns(4)
@@ -35,12 +42,12 @@ if transactions:
             <div class='metric-neutral'>
                 <p style='color: #9ca3af; font-size: 0.75rem; text-transform: uppercase; letter-spacing: 0.5px; margin: 0;'>Total Transactions</p>
                 <h2 style='color: #f3f4f6; font-size: 2.5rem; font-weight: 800; margin: 8px 0 0 0;'>{}</h2>
-                <p style='color: #a5b4fc; font-size: 0.8rem; margin: 4px 0 0 0;'>Lifetime</p>
+                <p style='color: #a5b4fc; font-size: 0.8rem; margin: 4px 0 0 0;'>{}</p>
             </div>
-        """.format(len(t_df)), unsafe_allow_html=True)
+        """.format(summary['transaction_count'], period), unsafe_allow_html=True)
     
     with c2:
-        revenue = t_df['total_amount'].sum()
+        revenue = summary['total_revenue']
         st.markdown("""
             <div class='metric-positive'>
                 <p style='color: #86efac; font-size: 0.75rem; text-transform: uppercase; letter-spacing: 0.5px; margin: 0;'>Total Revenue</p>
@@ -50,7 +57,7 @@ if transactions:
         """.format(revenue), unsafe_allow_html=True)
     
     with c3:
-        avg_order = t_df['total_amount'].mean()
+        avg_order = summary['average_order']
         st.markdown("""
             <div class='metric-neutral'>
                 <p style='color: #9ca3af; font-size: 0.75rem; text-transform: uppercase; letter-spacing: 0.5px; margin: 0;'>Avg. Order Value</p>
@@ -79,12 +86,16 @@ if transactions:
         st.subheader("Tren Pendapatan")
         st.markdown("<p style='color: #9ca3af; font-size: 0.85rem; margin-top: -8px;'>Grafik pemasukan seiring waktu</p>", unsafe_allow_html=True)
         
-        sales_over_time = t_df.set_index('created_at').resample('H')['total_amount'].sum().reset_index()
+        timeseries = api_request("GET", "/analytics/revenue-timeseries", params={"bucket": "hour", **period_params}) or []
+        sales_over_time = pd.DataFrame(timeseries, columns=['bucket', 'revenue', 'transactions'])
+        sales_over_time['bucket'] = pd.to_datetime(sales_over_time['bucket'])
+        # Jam yang kosong (ga ada penjualan) diisi 0 biar grafiknya ga loncat
+        sales_over_time = sales_over_time.set_index('bucket').asfreq('h', fill_value=0).reset_index()
         
         fig_area = go.Figure()
         fig_area.add_trace(go.Scatter(
-            x=sales_over_time['created_at'], 
-            y=sales_over_time['total_amount'],
+            x=sales_over_time['bucket'], 
+            y=sales_over_time['revenue'],
             fill='tozeroy',
             fillcolor='rgba(99, 102, 241, 0.2)',
             line=dict(color='#6366f1', width=3),
@@ -111,16 +122,14 @@ if transactions:
         st.subheader("Category Sales")
         st.markdown("<p style='color: #9ca3af; font-size: 0.85rem; margin-top: -8px;'>Product distribution</p>", unsafe_allow_html=True)
         
-        products = api_request("GET", "/products/")
-        if products:
-            p_df = pd.DataFrame(products)
-            p_df['category_name'] = p_df['category'].apply(lambda x: x['name'] if x else 'Uncategorized')
-            cat_counts = p_df['category_name'].value_counts().reset_index()
-            cat_counts.columns = ['Category', 'Count']
+        # Omzet per kategori, udah diringkas di tabel rollup backend
+        category_sales = api_request("GET", "/analytics/category-sales", params=period_params)
+        if category_sales:
+            cat_df = pd.DataFrame(category_sales)
             
             fig_pie = go.Figure(data=[go.Pie(
-                labels=cat_counts['Category'],
-                values=cat_counts['Count'],
+                labels=cat_df['category'],
+                values=cat_df['revenue'],
                 hole=0.5,
                 marker=dict(colors=['#6366f1', '#8b5cf6', '#ec4899', '#f59e0b', '#10b981']),
                 textfont=dict(size=14, color='white')
@@ -142,10 +151,10 @@ if transactions:
     st.subheader("🔥 Inventory Alerts")
     st.markdown("<p style='color: #9ca3af; font-size: 0.85rem; margin-top: -8px;'>Low stock items requiring attention</p>", unsafe_allow_html=True)
     
-    products = api_request("GET", "/products/")
-    if products:
-        p_df = pd.DataFrame(products)
-        low_stock = p_df[p_df['stock'] < 10].sort_values('stock')
+    # Backend cuma balikin produk yang stoknya di bawah batas reorder masing-masing
+    low_stock_products = api_request("GET", "/products/low-stock")
+    if low_stock_products is not None:
+        low_stock = pd.DataFrame(low_stock_products)
         
         if not low_stock.empty:
             st.warning(f"⚠️ {len(low_stock)} Products are Low on Stock!")
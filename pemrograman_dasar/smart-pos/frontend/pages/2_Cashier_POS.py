@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from utils import api_request, load_css, render_sidebar
+from utils import CHECKOUT_WAIT, api_request, get_local_catalog, get_sales_queue, load_css, render_sidebar
 
 st.set_page_config(page_title="Cashier POS", layout="wide", page_icon="🛒")
 load_css()
@@ -18,6 +18,43 @@ if "role" not in st.session_state or st.session_state.role not in ["cashier", "a
 if "cart" not in st.session_state:
     st.session_state.cart = []
 
+def add_to_cart(p):
+    existing = next((item for item in st.session_state.cart if item['product_id'] == p['id']), None)
+    if existing:
+        if existing['quantity'] + 1 <= p['stock']:
+            existing['quantity'] += 1
+            st.toast(f"Added another {p['name']}")
+        else:
+            st.error("No more stock")
+    else:
+        if p['stock'] < 1:
+            st.error("Out of Stock")
+            return
+        st.session_state.cart.append({
+            "product_id": p['id'],
+            "name": p['name'],
+            "price": p['price'],
+            "quantity": 1
+        })
+        st.toast(f"Added {p['name']}")
+
+# Checkout masuk antrian lokal dulu, dikirim ke backend di belakang
+sales_queue = get_sales_queue()
+sales_queue.remember_token(st.session_state.username, st.session_state.token)
+
+# Katalog lokal: tiap rerun cuma narik perubahan, list/search/scan gak nanya backend
+catalog = get_local_catalog()
+catalog.sync()
+
+def scan_barcode():
+    # Dipanggil pas scanner "enter"; cari di katalog lokal dulu, kalo belum ada baru tanya backend
+    code = st.session_state.scan_code.strip()
+    if code:
+        product = catalog.by_barcode(code) or api_request("GET", f"/products/by-barcode/{code}")
+        if product:
+            add_to_cart(product)
+    st.session_state.scan_code = ""
+
 # Layout Aplikasi Kasir
 col_left, col_right = st.columns([1.8, 1.2])
 
@@ -25,17 +62,22 @@ with col_left:
     st.title("🛒 Kasir POS")
     st.markdown("<p style='color: #9ca3af; margin-top: -10px;'>Pilih barang, masukkan keranjang, bayar!</p>", unsafe_allow_html=True)
     
-    # Ambil data produk
-    products = api_request("GET", "/products/")
+    # Input scanner barcode
+    st.text_input("📷 Scan Barcode", key="scan_code", on_change=scan_barcode, placeholder="Scan atau ketik barcode lalu Enter...")
+    
+    # Kotak Pencarian Barang; kalo katalog lokal belum kesinkron, dicari di backend (index FTS)
+    search = st.text_input("🔍 Search Product", "", placeholder="Name or Barcode...")
+    if catalog.synced:
+        products = catalog.search(search, limit=30) if search.strip() else catalog.list(limit=100)
+    elif search.strip():
+        products = api_request("GET", "/products/search", params={"q": search, "limit": 30})
+    else:
+        products = api_request("GET", "/products/")
     
     if products:
-        # Kotak Pencarian Barang
-        search = st.text_input("🔍 Search Product", "", placeholder="Name or Barcode...")
-        filtered_products = [p for p in products if search.lower() in p['name'].lower() or search in p['barcode']]
-        
         # Grid Layout
         cols = st.columns(3)
-        for idx, p in enumerate(filtered_products):
+        for idx, p in enumerate(products):
             with cols[idx % 3]:
                 with st.container(border=True):
                     st.write(f"**{p['name']}**")
@@ -44,24 +86,11 @@ with col_left:
                     
                     if p['stock'] > 0:
                         if st.button("Add", key=f"add_{p['id']}", use_container_width=True):
-                            # Add to cart logic
-                            existing = next((item for item in st.session_state.cart if item['product_id'] == p['id']), None)
-                            if existing:
-                                if existing['quantity'] + 1 <= p['stock']:
-                                    existing['quantity'] += 1
-                                    st.toast(f"Added another {p['name']}")
-                                else:
-                                    st.error("No more stock")
-                            else:
-                                st.session_state.cart.append({
-                                    "product_id": p['id'],
-                                    "name": p['name'],
-                                    "price": p['price'],
-                                    "quantity": 1
-                                })
-                                st.toast(f"Added {p['name']}")
+                            add_to_cart(p)
                     else:
                         st.error("Out of Stock")
+    elif search.strip():
+        st.info("Produk ga ketemu.")
     else:
         st.info("No products available.")
     st.markdown("</div>", unsafe_allow_html=True)
@@ -91,18 +120,26 @@ with col_right:
         
         if st.button("Charge / Checkout", type="primary", use_container_width=True):
             items_payload = [{"product_id": item['product_id'], "quantity": item['quantity']} for item in st.session_state.cart]
-            payload = {"items": items_payload}
             
             # Save cart for receipt BEFORE clearing
             receipt_items = st.session_state.cart.copy()
             
-            res = api_request("POST", "/transactions/", data=payload)
-            if res:
+            # Ditunggu sebentar aja; kalo backend lemot/mati, penjualannya tetep aman di antrian
+            key = sales_queue.enqueue(st.session_state.username, items_payload)
+            res = sales_queue.wait(key, CHECKOUT_WAIT if sales_queue.online else 0)
+            if res and res['status'] == "rejected":
+                sales_queue.dismiss(key)  # kasir udah liat errornya, keranjang gak dikosongin
+                st.error(f"Transaksi ditolak: {res['error']}")
+            else:
                 st.session_state.cart = []
                 st.balloons()
+                transaction_no = f"#{res['transaction_id']}" if res else f"OFFLINE-{key[:8].upper()}"
                 
                 # Show Receipt
-                st.success("✅ Transaction Successful!")
+                if res:
+                    st.success("✅ Transaction Successful!")
+                else:
+                    st.warning("📴 Server belum jawab: transaksi disimpen di kasir dan dikirim otomatis.")
                 with st.expander("🖨️ View Receipt", expanded=True):
                     st.markdown("""
                         <div style="background-color: white; color: black; padding: 20px; border-radius: 10px; font-family: monospace;">
@@ -115,7 +152,7 @@ with col_right:
                     # Transaction details
                     st.markdown(f"""
                         <div style="background-color: white; color: black; font-family: monospace;">
-                            <p style="color: black;"><b>Transaction ID:</b> #{res['id']}</p>
+                            <p style="color: black;"><b>Transaction ID:</b> {transaction_no}</p>
                             <p style="color: black;"><b>Cashier:</b> {st.session_state.username}</p>
                             <hr style="border-top: 1px dashed black;">
                     """, unsafe_allow_html=True)
@@ -132,7 +169,7 @@ with col_right:
                     st.markdown(f"""
                         <hr style="border-top: 1px dashed black;">
                         <div style="background-color: white; color: black; font-family: monospace;">
-                            <h3 style="color: black; text-align: right; margin: 10px 0;">TOTAL: Rp {res['total_amount']:,.0f}</h3>
+                            <h3 style="color: black; text-align: right; margin: 10px 0;">TOTAL: Rp {total_amount:,.0f}</h3>
                             <hr style="border-top: 1px dashed black;">
                             <p style="text-align: center; color: black; margin: 10px 0;">Thank you for shopping!</p>
                             <p style="text-align: center; color: black; font-size: 0.85rem;">Visit us again soon 😊</p>
@@ -149,5 +186,22 @@ with col_right:
             st.rerun()
     else:
         st.info("Cart is empty. Add products from the left.")
+
+    # Status antrian offline
+    queued = sales_queue.summary()
+    waiting = queued.get("pending", 0) + queued.get("login", 0)
+    if waiting:
+        st.caption(f"📤 {waiting} transaksi nunggu dikirim ke server")
+    rejected = sales_queue.rejected()
+    if rejected:
+        with st.expander(f"⚠️ {len(rejected)} transaksi offline ditolak server"):
+            for sale in rejected:
+                st.write(f"**{sale['queued_at'][:19]}** - {sale['error']}")
+                st.caption(", ".join(
+                    f"{(catalog.get(i['product_id']) or {}).get('name', i['product_id'])} x{i['quantity']}" for i in sale['items']
+                ))
+                if st.button("Hapus", key=f"dismiss_{sale['key']}"):
+                    sales_queue.dismiss(sale['key'])
+                    st.rerun()
         
     st.markdown("</div>", unsafe_allow_html=True)
@@ -17,6 +17,10 @@ st.title("📦 Manajemen Inventaris")
 st.markdown("<p style='color: #9ca3af; margin-top: -10px;'>Tambah, hapus, dan edit stok barang di sini.</p>", unsafe_allow_html=True)
 st.markdown("<div style='height: 20px;'></div>", unsafe_allow_html=True)
 
+# Tiap resource cukup diambil sekali per rerun, dipake bareng sama dua tab
+categories = api_request("GET", "/products/categories/")
+products = api_request("GET", "/products/")
+
 # Navigasi Tab (Produk & Kategori)
 tab1, tab2 = st.tabs(["📦 Produk", "🏷️ Kategori"])
 
@@ -29,8 +33,7 @@ with tab1:
         # --- Bagian Form Tambah/Edit ---
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         
-        # Fetch categories for dropdown
-        categories = api_request("GET", "/products/categories/")
+        # Categories for dropdown
         cat_options = {c["name"]: c["id"] for c in categories} if categories else {}
         
         # Add New Product
@@ -42,6 +45,7 @@ with tab1:
                 new_price = st.number_input("Harga (Rp)", min_value=0.0, step=100.0, key="prod_price")
             with col_form2:
                 new_stock = st.number_input("Stok Awal", min_value=0, step=1, key="prod_stock")
+                new_reorder = st.number_input("Batas Reorder", min_value=0, value=10, step=1, key="prod_reorder", help="Muncul di Inventory Alerts kalo stok di bawah angka ini")
                 
                 if cat_options:
                     selected_cat_name = st.selectbox("Kategori", list(cat_options.keys()), key="prod_cat")
@@ -59,6 +63,7 @@ with tab1:
                         "barcode": new_barcode,
                         "price": new_price,
                         "stock": new_stock,
+                        "reorder_threshold": new_reorder,
                         "category_id": selected_cat_id
                     }
                     res = api_request("POST", "/products/", data=data)
@@ -75,14 +80,14 @@ with tab1:
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         st.subheader("Daftar Produk")
         
-        products = api_request("GET", "/products/")
         if products:
             p_df = pd.DataFrame(products)
             
-            # Fitur Pencarian
+            # Fitur Pencarian (pake endpoint search di backend)
             search_query = st.text_input("🔍 Cari Barang", placeholder="Nama atau Barcode...", key="search_prod_list")
-            if search_query:
-                p_df = p_df[p_df['name'].str.contains(search_query, case=False) | p_df['barcode'].str.contains(search_query, case=False)]
+            if search_query.strip():
+                results = api_request("GET", "/products/search", params={"q": search_query, "limit": 100}) or []
+                p_df = pd.DataFrame(results, columns=p_df.columns)
             
             # Tampilkan Tabel (pake st.dataframe biar lebih interaktif)
             st.dataframe(
@@ -146,7 +151,6 @@ with tab2:
     st.markdown("---")
     
     # List Kategori
-    categories = api_request("GET", "/products/categories/")
     if categories:
         st.subheader("📋 Semua Kategori")
         
@@ -162,9 +166,8 @@ with tab2:
                 c2.write(cat['name'])
                 with c3:
                     if st.button("🗑️", key=f"del_cat_{cat['id']}", help="Hapus Kategori"):
-                        # Cek dulu ada produknya ga
-                        all_products = api_request("GET", "/products/")
-                        has_products = any(p.get('category', {}).get('id') == cat['id'] for p in (all_products or []))
+                        # Cek dulu ada produknya ga (daftar produk udah diambil di atas)
+                        has_products = any((p.get('category') or {}).get('id') == cat['id'] for p in (products or []))
                         
                         if has_products:
                             st.error("⚠️ Gabisa dihapus, masih ada produk di kategori ini!")
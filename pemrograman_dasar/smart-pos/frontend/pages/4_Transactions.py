@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from utils import api_request, load_css, render_sidebar
+from utils import api_page, api_request, load_css, render_sidebar
 
 st.set_page_config(page_title="Transaction History", layout="wide", page_icon="📜")
 load_css()
@@ -25,13 +25,27 @@ with col2:
 
 st.markdown("<div style='height: 20px;'></div>", unsafe_allow_html=True)
 
-# Ambil data transaksi dari API
-transactions = api_request("GET", "/transactions/")
+# Ambil data transaksi dari API, per halaman (cursor). Halaman yang lebih lama
+# baru ditarik kalo user klik "Muat lebih banyak"
+TX_PAGE_SIZE = 100
+if "tx_pages" not in st.session_state:
+    st.session_state.tx_pages = 1
+
+transactions, next_cursor = [], None
+for _ in range(st.session_state.tx_pages):
+    params = {"limit": TX_PAGE_SIZE}
+    if next_cursor:
+        params["cursor"] = next_cursor
+    page, next_cursor = api_page("/transactions/", params)
+    transactions += page or []
+    if not next_cursor:
+        break
 
 if transactions:
     # Ubah ke DataFrame biar enak diolah pake Pandas
     df = pd.DataFrame(transactions)
-    df['created_at'] = pd.to_datetime(df['created_at'])
+    # ISO8601: detik bulat dikirim tanpa .microsecond, jadi formatnya bisa campur
+    df['created_at'] = pd.to_datetime(df['created_at'], format='ISO8601')
     df = df.sort_values(by='created_at', ascending=False)
     
     st.markdown("<div style='height: 16px;'></div>", unsafe_allow_html=True)
@@ -148,6 +162,13 @@ if transactions:
     else:
         st.info("Ga nemu transaksi yang dicari.")
 
+    # Filter & pencarian cuma jalan di transaksi yang udah dimuat
+    if next_cursor:
+        st.caption(f"Baru {len(transactions)} transaksi terbaru yang dimuat.")
+        if st.button("⬇️ Muat lebih banyak", key="load_more_tx", use_container_width=True):
+            st.session_state.tx_pages += 1
+            st.rerun()
+
 else:
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.info("📭 Belum ada transaksi sama sekali. Yuk jualan dulu!")
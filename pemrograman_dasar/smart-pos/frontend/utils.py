@@ -1,8 +1,415 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
 import requests
 import streamlit as st
 import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 API_URL = "http://127.0.0.1:8000"
+# (connect, read) detik; export/import gede bisa kasih timeout sendiri
+REQUEST_TIMEOUT = (3.05, 30)
+
+@st.cache_resource
+def get_http_session():
+    # Satu Session buat semua rerun & user: koneksi ke backend di-pool (keep-alive),
+    # gak bikin TCP baru tiap request. Token dikirim per request, jadi aman dishare.
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,  # cuma verb idempotent (GET/PUT/DELETE/...), POST gak diulang
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = "gzip"
+    return session
+
+# --- Cache response GET ---
+# (prefix endpoint, resource, TTL detik, shared). Katalog gak pake login & sama buat
+# semua user, jadi dishare antar sesi; transaksi/analytics dikunci per token.
+CACHE_RULES = [
+    ("/products/categories/", "categories", 120, True),
+    ("/products/", "products", 15, True),
+    ("/transactions/", "transactions", 15, False),
+    ("/analytics/", "analytics", 60, False),
+]
+# POST/PUT/DELETE ke resource kiri bikin basi resource kanan (checkout ngurangin stok)
+INVALIDATES = {
+    "categories": ("categories",),
+    "products": ("products",),
+    "transactions": ("transactions", "products", "analytics"),
+}
+CACHE_MAX_ENTRIES = 500
+
+def _cache_rule(endpoint):
+    return next((rule for rule in CACHE_RULES if endpoint.startswith(rule[0])), None)
+
+class ResponseCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (expires_at, body bytes, etag, next cursor); key[0] = resource
+        self._generations = {}  # resource -> naik tiap invalidate
+
+    def generation(self, resource):
+        with self._lock:
+            return self._generations.get(resource, 0)
+
+    def get(self, key):
+        # Entry yang udah lewat TTL tetep dibalikin: body + ETag-nya dipake buat If-None-Match
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, body, ttl, generation, etag=None, next_cursor=None):
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                return  # ada mutasi pas request ini jalan, datanya bisa udah basi
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + ttl, body, etag, next_cursor)
+            while len(self._entries) > CACHE_MAX_ENTRIES:
+                del self._entries[next(iter(self._entries))]  # yang paling lama
+
+    def invalidate(self, *resources):
+        with self._lock:
+            for resource in resources:
+                self._generations[resource] = self._generations.get(resource, 0) + 1
+            for key, (_, body, etag, next_cursor) in list(self._entries.items()):
+                if key[0] in resources:
+                    # Ditandain basi aja; kalo ternyata belum berubah, backend jawab 304
+                    self._entries[key] = (0, body, etag, next_cursor)
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache()
+
+def invalidate_cache(endpoint):
+    rule = _cache_rule(endpoint)
+    if rule:
+        resources = INVALIDATES.get(rule[1], (rule[1],))
+        get_response_cache().invalidate(*resources)
+        if "products" in resources:
+            get_local_catalog().expire()
+
+# --- Katalog lokal buat kasir ---
+# Salinan katalog di memori, dishare semua sesi. Sekali narik penuh, abis itu tiap
+# rerun cuma minta yang berubah sejak versi terakhir (GET /products/changes).
+CATALOG_SYNC_INTERVAL = 1.0  # detik; rerun yang lebih rapat pake salinan yang ada
+CATALOG_RETRY_DELAY = 10.0  # detik; backend mati = rerun gak nunggu timeout tiap kali
+CATALOG_PAGE_SIZE = 5000
+CATALOG_TIMEOUT = (1.0, 2.0)  # (connect, read) detik; sync jalan di tengah rerun POS
+
+@st.cache_resource
+def get_catalog_session():
+    # Session sendiri tanpa Retry: backend macet cuma bikin rerun nunggu CATALOG_TIMEOUT
+    # sekali, bukan 4x timeout baca dari session biasa. Abis itu pake salinan lokal.
+    session = requests.Session()
+    session.headers["Accept-Encoding"] = "gzip"
+    return session
+
+class LocalCatalog:
+    def __init__(self):
+        self._sync_lock = threading.Lock()
+        self.version = 0
+        self.synced = False
+        self._next_sync = 0.0
+        # (id -> product, barcode -> id, id -> "nama barcode" huruf kecil buat search).
+        # Diganti utuh tiap ada perubahan (gak diubah di tempat), jadi sesi lain
+        # bisa baca/iterasi tanpa lock pas sync lagi jalan
+        self._state = ({}, {}, {})
+
+    def expire(self):
+        self._next_sync = 0.0
+
+    def sync(self):
+        if time.monotonic() < self._next_sync:
+            return self.synced
+        if not self._sync_lock.acquire(blocking=False):
+            return self.synced  # sesi lain lagi sync
+        try:
+            products, deleted, version, cursor = [], [], self.version, None
+            try:
+                while True:
+                    params = {"since": self.version, "limit": CATALOG_PAGE_SIZE}
+                    if cursor:
+                        params["cursor"] = cursor
+                    response = get_catalog_session().get(f"{API_URL}/products/changes", params=params, timeout=CATALOG_TIMEOUT)
+                    response.raise_for_status()
+                    body = response.json()
+                    products += body["products"]
+                    deleted += body["deleted"]
+                    version = body["version"]
+                    cursor = response.headers.get("X-Next-Cursor")
+                    if not cursor:
+                        break
+            except (requests.RequestException, ValueError):
+                # Backend lagi gak bisa dihubungi: pake salinan yang ada
+                self._next_sync = time.monotonic() + CATALOG_RETRY_DELAY
+                return self.synced
+            if products or deleted:
+                self._apply(products, deleted)
+            self.version, self.synced = version, True
+            self._next_sync = time.monotonic() + CATALOG_SYNC_INTERVAL
+            return True
+        finally:
+            self._sync_lock.release()
+
+    def _apply(self, products, deleted):
+        by_id, barcodes, text = (dict(d) for d in self._state)
+        # Hapus dulu baru upsert: id yang dihapus terus kepake lagi tetep ada
+        for product_id in deleted + [p["id"] for p in products]:
+            old = by_id.pop(product_id, None)
+            text.pop(product_id, None)
+            if old and barcodes.get(old["barcode"]) == product_id:
+                del barcodes[old["barcode"]]
+        for p in products:
+            by_id[p["id"]] = p
+            barcodes[p["barcode"]] = p["id"]
+            text[p["id"]] = f"{p['name']} {p['barcode']}".lower()
+        self._state = (by_id, barcodes, text)
+
+    def list(self, limit=100):
+        products = self._state[0]
+        return [products[i] for i in sorted(products)[:limit]]
+
+    def search(self, q, limit=30):
+        terms = q.lower().split()
+        if not terms:
+            return []
+        products, _, text = self._state
+        ids = [i for i, t in text.items() if terms[0] in t]
+        for term in terms[1:]:
+            ids = [i for i in ids if term in text[i]]
+        return [products[i] for i in sorted(ids)[:limit]]
+
+    def get(self, product_id):
+        return self._state[0].get(product_id)
+
+    def by_barcode(self, barcode):
+        products, barcodes, _ = self._state
+        product_id = barcodes.get(barcode)
+        return products.get(product_id) if product_id is not None else None
+
+@st.cache_resource
+def get_local_catalog():
+    return LocalCatalog()
+
+# --- Antrian penjualan offline (kasir) ---
+# Checkout ditulis dulu ke file SQLite lokal, baru dikirim thread flusher ke
+# POST /transactions/batch. Tiap penjualan bawa idempotency key, jadi kirim ulang
+# (abis timeout, crash, dll) gak bikin transaksi dobel. Backend lemot/mati, kasir tetep jalan.
+SALES_QUEUE_PATH = os.environ.get(
+    "SMARTPOS_SALES_QUEUE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sales_queue.db")
+)
+SALES_BATCH_SIZE = 50
+FLUSH_INTERVAL = 5.0  # detik antar flush kalo gak ada checkout baru
+FLUSH_MAX_BACKOFF = 60.0
+CHECKOUT_WAIT = 2.0  # detik maksimal kasir nunggu jawaban backend sebelum struk offline
+# Token login gak ikut disimpen di file, cuma di memori (remember_token)
+SALES_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        key TEXT PRIMARY KEY,
+        username TEXT NOT NULL,
+        items TEXT NOT NULL,
+        queued_at TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',  -- pending / login / rejected
+        error TEXT
+    )
+"""
+
+def _error_detail(response):
+    try:
+        detail = response.json().get("detail")
+    except (ValueError, AttributeError):
+        detail = None
+    return f"{response.status_code} - {detail or response.text[:200] or response.reason}"
+
+class SalesQueue:
+    def __init__(self, path, session, on_flushed=None):
+        self.path = path
+        self.online = True  # flush terakhir nyampe ke backend?
+        self._session = session
+        self._on_flushed = on_flushed
+        self._tokens = {}  # username -> token terbaru dari sesi yang lagi login
+        self._tokens_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._done = threading.Condition()
+        self._waiting = set()
+        self._results = {}  # key -> hasil, cuma buat checkout yang lagi ditunggu kasir
+        with self._db() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SALES_TABLE.format(table="sales"))
+            old_file = "token" in [column[1] for column in conn.execute("PRAGMA table_info(sales)")]
+            if old_file:
+                # Antrian versi lama nyimpen token di file: pindahin ke tabel tanpa kolom itu (sekali jalan)
+                conn.execute("BEGIN")
+                conn.execute(SALES_TABLE.format(table="sales_new"))
+                conn.execute(
+                    "INSERT INTO sales_new (key, username, items, queued_at, status, error) "
+                    "SELECT key, username, items, queued_at, status, error FROM sales"
+                )
+                conn.execute("DROP TABLE sales")
+                conn.execute("ALTER TABLE sales_new RENAME TO sales")
+        if old_file:
+            with self._db() as conn:
+                conn.execute("VACUUM")  # sisa token di halaman bebas ikut ilang
+        self._wake.set()  # sisa penjualan dari sebelum restart langsung dikirim
+        threading.Thread(target=self._run, name="sales-queue-flusher", daemon=True).start()
+
+    @contextmanager
+    def _db(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA synchronous=FULL")  # udah di-commit = aman walau listrik mati
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, username, items):
+        """Simpen satu penjualan (durable) dan bangunin flusher; balikin idempotency key-nya.
+
+        Dikirim pake token yang terakhir dikasih remember_token buat username ini."""
+        key = uuid.uuid4().hex
+        with self._done:
+            self._waiting.add(key)
+        with self._db() as conn:
+            conn.execute(
+                "INSERT INTO sales (key, username, items, queued_at) VALUES (?, ?, ?, ?)",
+                (key, username, json.dumps(items), datetime.utcnow().isoformat()),
+            )
+        self._wake.set()
+        return key
+
+    def wait(self, key, timeout):
+        """Hasil dari backend ({status, transaction_id, error}), atau None kalo belum ada."""
+        with self._done:
+            self._done.wait_for(lambda: key in self._results, timeout)
+            self._waiting.discard(key)
+            return self._results.pop(key, None)
+
+    def remember_token(self, username, token):
+        # Penjualan yang nyangkut karena login-nya kedaluwarsa (atau abis restart) dikirim lagi pake token baru
+        with self._tokens_lock:
+            if self._tokens.get(username) == token:
+                return
+            self._tokens[username] = token
+            with self._db() as conn:
+                stuck = conn.execute(
+                    "UPDATE sales SET status = 'pending', error = NULL WHERE username = ? AND status = 'login'", (username,)
+                ).rowcount
+        if stuck:
+            self._wake.set()
+
+    def summary(self):
+        with self._db() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM sales GROUP BY status").fetchall())
+
+    def rejected(self):
+        with self._db() as conn:
+            rows = conn.execute(
+                "SELECT key, queued_at, items, error FROM sales WHERE status = 'rejected' ORDER BY queued_at"
+            ).fetchall()
+        return [{"key": k, "queued_at": q, "items": json.loads(i), "error": e} for k, q, i, e in rows]
+
+    def dismiss(self, key):
+        with self._db() as conn:
+            conn.execute("DELETE FROM sales WHERE key = ?", (key,))
+
+    def _run(self):
+        delay = FLUSH_INTERVAL
+        while True:
+            self._wake.wait(delay)
+            self._wake.clear()
+            try:
+                self.flush()
+                self.online, delay = True, FLUSH_INTERVAL
+            except (requests.RequestException, ValueError):
+                # Backend gak bisa dihubungi / lagi error (5xx): coba lagi makin jarang, checkout baru tetep bangunin
+                self.online, delay = False, min(delay * 2, FLUSH_MAX_BACKOFF)
+
+    def _wait_for_login(self, username, batch, token, error):
+        # Parkir sampe kasirnya login lagi (remember_token). Kalo tokennya udah diganti
+        # pas request ini jalan, biarin pending: loop flush langsung nyoba pake yang baru
+        with self._tokens_lock:
+            if self._tokens.get(username) != token:
+                return
+            with self._db() as conn:
+                conn.executemany(
+                    "UPDATE sales SET status = 'login', error = ? WHERE key = ?",
+                    [(error, row[0]) for row in batch],
+                )
+
+    def flush(self):
+        """Kirim semua yang pending, paling lama dulu, satu batch per kasir."""
+        while True:
+            with self._db() as conn:
+                rows = conn.execute(
+                    "SELECT key, username, items, queued_at FROM sales WHERE status = 'pending' "
+                    "ORDER BY queued_at LIMIT ?", (SALES_BATCH_SIZE,)
+                ).fetchall()
+            if not rows:
+                return
+            username = rows[0][1]
+            batch = [row for row in rows if row[1] == username]
+            token = self._tokens.get(username)
+            if token is None:
+                # Abis restart token-nya belum ada (gak disimpen di file)
+                self._wait_for_login(username, batch, None, "Nunggu login")
+                continue
+            body = {"transactions": [
+                {"idempotency_key": key, "items": json.loads(items), "created_at": queued_at}
+                for key, _, items, queued_at in batch
+            ]}
+            response = self._session.post(
+                f"{API_URL}/transactions/batch", json=body,
+                headers={"Authorization": f"Bearer {token}"}, timeout=REQUEST_TIMEOUT,
+            )
+            if response.status_code == 401:
+                self._wait_for_login(username, batch, token, "Login expired")
+                continue
+            if 400 <= response.status_code < 500:
+                # Ditolak (user nonaktif, data gak valid, ...): dikirim ulang juga bakal ditolak lagi
+                error = _error_detail(response)
+                results = [
+                    {"idempotency_key": row[0], "status": "rejected", "transaction_id": None, "error": error}
+                    for row in batch
+                ]
+            else:
+                response.raise_for_status()
+                results = response.json()
+            with self._db() as conn:
+                for result in results:
+                    if result["status"] == "rejected":
+                        conn.execute(
+                            "UPDATE sales SET status = 'rejected', error = ? WHERE key = ?",
+                            (result["error"], result["idempotency_key"]),
+                        )
+                    else:
+                        conn.execute("DELETE FROM sales WHERE key = ?", (result["idempotency_key"],))
+            if self._on_flushed:
+                self._on_flushed()
+            with self._done:
+                for result in results:
+                    if result["idempotency_key"] in self._waiting:
+                        self._results[result["idempotency_key"]] = result
+                self._done.notify_all()
+
+@st.cache_resource
+def get_sales_queue():
+    cache, catalog = get_response_cache(), get_local_catalog()
+    def on_flushed():
+        cache.invalidate(*INVALIDATES["transactions"])
+        catalog.expire()
+    return SalesQueue(SALES_QUEUE_PATH, get_http_session(), on_flushed)
 
 def hide_sidebar():
     st.markdown("""
@@ -19,7 +426,9 @@ def hide_sidebar():
 
 def login(username, password):
     try:
-        response = requests.post(f"{API_URL}/auth/token", data={"username": username, "password": password})
+        response = get_http_session().post(
+            f"{API_URL}/auth/token", data={"username": username, "password": password}, timeout=REQUEST_TIMEOUT
+        )
         if response.status_code == 200:
             return response.json()
         else:
@@ -31,34 +440,69 @@ def login(username, password):
     except Exception as e:
         return {"error": f"Connection Error: {str(e)}"}
 
-def api_request(method, endpoint, data=None, params=None):
+def api_request(method, endpoint, data=None, params=None, timeout=REQUEST_TIMEOUT):
+    return _api_request(method, endpoint, data, params, timeout)[0]
+
+def api_page(endpoint, params=None, timeout=REQUEST_TIMEOUT):
+    """GET satu halaman list; balikin (rows, cursor halaman berikutnya atau None).
+
+    Halaman berikutnya diminta pake params {"cursor": cursor}."""
+    return _api_request("GET", endpoint, None, params, timeout)
+
+def _api_request(method, endpoint, data, params, timeout):
     headers = {}
     if "token" in st.session_state:
         headers["Authorization"] = f"Bearer {st.session_state.token}"
     
     url = f"{API_URL}{endpoint}"
+    session = get_http_session()
+    cache, cache_key, rule = get_response_cache(), None, _cache_rule(endpoint)
+    if method == "GET" and rule:
+        resource, ttl, shared = rule[1:]
+        scope = None if shared else st.session_state.get("token")
+        cache_key = (resource, scope, endpoint, tuple(sorted((params or {}).items())))
+        cached = cache.get(cache_key)
+        if cached and cached[0] >= time.monotonic():
+            # Simpen bytes, di-decode tiap hit: tiap sesi dapet objek sendiri
+            return json.loads(cached[1]), cached[3]
+        if cached and cached[2]:
+            headers["If-None-Match"] = cached[2]
+        generation = cache.generation(resource)
     try:
         if method == "GET":
-            response = requests.get(url, headers=headers, params=params)
+            response = session.get(url, headers=headers, params=params, timeout=timeout)
         elif method == "POST":
-            response = requests.post(url, headers=headers, json=data)
+            response = session.post(url, headers=headers, json=data, timeout=timeout)
         elif method == "PUT":
-            response = requests.put(url, headers=headers, json=data)
+            response = session.put(url, headers=headers, json=data, timeout=timeout)
         elif method == "DELETE":
-            response = requests.delete(url, headers=headers)
+            response = session.delete(url, headers=headers, timeout=timeout)
         
+        if response.status_code == 304 and cache_key and cached:
+            # Data belum berubah: body lama dipake lagi, backend gak perlu query ulang
+            cache.put(cache_key, cached[1], ttl, generation, cached[2], cached[3])
+            return json.loads(cached[1]), cached[3]
         if response.status_code in [200, 201]:
-            return response.json()
+            result = response.json()
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if cache_key:
+                cache.put(cache_key, response.content, ttl, generation, response.headers.get("ETag"), next_cursor)
+            return result, next_cursor
         elif response.status_code == 401:
             st.warning("Session expired. Please login again.")
             st.session_state.clear()
             st.rerun() # Use rerun in newer streamlit, or experimental_rerun
+            return None, None
         else:
             st.error(f"Request failed: {response.status_code} - {response.text}")
-            return None
+            return None, None
     except Exception as e:
         st.error(f"API Error: {e}")
-        return None
+        return None, None
+    finally:
+        # Mutasi yang timeout bisa aja udah masuk di backend, jadi tetep di-invalidate
+        if method != "GET":
+            invalidate_cache(endpoint)
 
 def load_css():
     st.markdown("""